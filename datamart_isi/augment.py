@@ -2,17 +2,117 @@ import pandas as pd
 import typing
 import traceback
 import logging
+import pickle
+import threading
+import time
+import string
+from collections import OrderedDict
 from d3m.base import utils as d3m_utils
 from datamart_isi.utilities.utils import Utils
 from d3m.container import Dataset as d3m_Dataset
 from datamart_isi.utilities import connection
-from SPARQLWrapper import SPARQLWrapper, JSON, POST, URLENCODED
+from datamart_isi.utilities.sparql_session import run_sparql_query
 from wikifier.utils import remove_punctuation
 from datamart_isi.utilities.geospatial_related import GeospatialRelated
 from datamart_isi.utilities.singleton import singleton
 from datamart_isi.cache.wikidata_cache import QueryCache
+from datamart_isi.cache.general_search_cache import GeneralSearchCache
+from datamart_isi.cache.sparql_disk_cache import SparqlDiskCache
+from datamart_isi.utilities.hash_utils import get_str_hash
 from datamart_isi import config
 
+QUERY_CACHE_KEY_PREFIX = "general_search_v1_"
+QUERY_CACHE_EXPIRE_TIME = config.general_search_query_cache_expire_time
+QUERY_CACHE_SIZE = config.general_search_query_cache_size
+_logger = logging.getLogger(__name__)
+
+# constant parts of the general search sparql query
+QUERY_PREFIX = '''
+            prefix ps: <http://www.wikidata.org/prop/statement/>
+            prefix pq: <http://www.wikidata.org/prop/qualifier/>
+            prefix p: <http://www.wikidata.org/prop/>
+        '''
+# the time variables are only bound by temporal search or augment with time, only select them when needed
+QUERY_SELECTION_VARIABLES = ["?dataset", "?datasetLabel", "?variableName", "?variable", "?score", "?rank", "?url",
+                             "?file_type", "?title"]
+QUERY_SELECTION_TIME_VARIABLES = ["?start_time", "?end_time", "?time_granularity"]
+QUERY_SELECTION_EXTRA_VARIABLES = ["?keywords", "?extra_information"]
+QUERY_SELECTION_DISTINCT = '''
+                            SELECT DISTINCT ?dataset ?datasetLabel ?score ?rank ?url ?file_type ?title ?keywords ?extra_information
+                            '''
+# blazegraph query hints, let the runtime optimizer decide the join order and evaluate in parallel
+QUERY_WHERE = '''
+            WHERE {
+                hint:Query hint:optimizer "Runtime" .
+                hint:Query hint:maxParallel 8 .
+        '''
+# the full text search results are small, they should be evaluated first to drive the joins
+QUERY_RUN_FIRST_HINT = '''
+                hint:Prior hint:runFirst true .
+        '''
+QUERY_STRUCTURE = '''
+                ?dataset rdfs:label ?datasetLabel.
+                ?dataset p:P2699/ps:P2699 ?url.
+                ?dataset p:P2701/ps:P2701 ?file_type.
+                ?dataset p:C2010/ps:C2010 ?extra_information.
+                ?dataset p:C2005 ?variable.
+                ?variable ps:C2005 ?variableName.
+                ?dataset p:P1476 ?title_url.
+                ?title_url ps:P1476 ?title .
+                ?dataset p:C2004 ?keywords_url.
+                ?keywords_url ps:C2004 ?keywords.
+        '''
+QUERY_KEYWORDS_SCORE_FILTER = """
+                BIND((IF(BOUND(?score_key1), ?score_key1, 0) + IF(BOUND(?score_key2), ?score_key2, 0)) AS ?score_keywords)
+                filter (?score_keywords != 0)
+                """
+QUERY_ORDER = "ORDER BY DESC(?score) ?title"
+# amount of datasets queried together in one time information query
+TIME_INFORMATION_QUERY_CHUNK_SIZE = 500
+# templates of the search parts of the general search sparql query
+QUERY_VARIABLES_SEARCH_TEMPLATE = string.Template('''
+                ?variable pq:C2006 [
+                            bds:search """$query_part""" ;
+                            bds:relevance ?score_var ;
+                          ].
+                ''')
+QUERY_KEYWORDS_SEARCH_TEMPLATE = string.Template('''
+                optional {
+                ?keywords_url ps:C2004 [
+                                bds:search """$query_part""" ;
+                                bds:relevance ?score_key1 ;
+                              ].
+                }
+                
+                optional {
+                ?title_url ps:P1476 [
+                                bds:search """$query_part""" ;
+                                bds:relevance ?score_key2 ;
+                              ].
+                }
+                ''')
+QUERY_TEMPORAL_SEARCH_TEMPLATE = string.Template('''
+                ?variable pq:C2013 ?time_granularity .
+                ?variable pq:C2011 ?start_time .
+                ?variable pq:C2012 ?end_time .
+                FILTER(?time_granularity >= $granularity)
+                FILTER(!((?start_time > "$end_date"^^xsd:dateTime) || (?end_time < "$start_date"^^xsd:dateTime)))
+                ''')
+QUERY_GEOSPATIAL_SEARCH_TEMPLATE = string.Template('''
+                                    ?variable pq:C2006 [
+                                        bds:search """$query_part""" ;
+                                        bds:relevance ?score_geo ;
+                                    ].
+                                 ''')
+QUERY_AUGMENT_WITH_TIME_TEMPLATE = string.Template('''
+                ?dataset p:C2005 ?variable2.
+                ?variable2 pq:C2011 ?start_time.
+                ?variable2 pq:C2012 ?end_time.
+                ?variable2 pq:C2013 ?time_granularity.
+                FILTER(?time_granularity >= $granularity)
+                FILTER(!((?start_time > "$start_date"^^xsd:dateTime) || (?end_time < "$end_date"^^xsd:dateTime)))
+            ''')
+
 
 @singleton
 class Augment:
@@ -21,12 +121,13 @@ class Augment:
     it is used to parse the given input from DatamartQuery to sparql query and return the search results
     """
     def __init__(self) -> None:
-        self.qm = SPARQLWrapper(connection.get_general_search_server_url())
-        self.qm.setReturnFormat(JSON)
-        self.qm.setMethod(POST)
-        self.qm.setRequestMethod(URLENCODED)
-        self.logger = logging.getLogger(__name__)
+        self.general_search_server = connection.get_general_search_server_url()
+        self.logger = _logger
         self.wikidata_cache_manager = QueryCache()
+        # reuse the memcache connection of general search cache, local cache is used to skip even the memcache round trip
+        self.mc = GeneralSearchCache().mc
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
 
     def query_by_sparql(self, query: dict, dataset: d3m_Dataset = None, **kwargs) -> typing.Optional[typing.List[dict]]:
         """
@@ -42,18 +143,80 @@ class Augment:
             query_body = self.parse_sparql_query(query, dataset, **kwargs)
             self.logger.debug("Query sent to datamart blazegraph is:")
             self.logger.debug(query_body)
+            cache_key = QUERY_CACHE_KEY_PREFIX + get_str_hash(query_body)
+            results = self._get_cached_query_results(cache_key)
+            if results is not None:
+                self.logger.info("Cache hit! will use the cached general search results.")
+                return results
+            results = SparqlDiskCache.get(self.general_search_server, query_body)
+            if results is not None:
+                self.logger.info("Disk cache hit! will use the cached general search results.")
+                self._add_query_results_to_cache(cache_key, results)
+                return results
             try:
-                self.qm.setQuery(query_body)
-                results = self.qm.query().convert()['results']['bindings']
+                results = run_sparql_query(self.general_search_server, query_body)['results']['bindings']
             except Exception as e:
                 self.logger.error(e, exc_info=True)
                 traceback.print_exc()
                 return []
+            self._add_query_results_to_cache(cache_key, results)
+            SparqlDiskCache.set(self.general_search_server, query_body, results, expire=QUERY_CACHE_EXPIRE_TIME)
             return results
         else:
             self.logger.error("No query given, query failed!")
             return []
 
+    def _get_cached_query_results(self, cache_key: str) -> typing.Optional[typing.List[dict]]:
+        """
+        Function used to get the cached results of a sparql query, check local cache first and then memcache
+        :param cache_key: the cache key of the query
+        :return: a new copy of the cached results if hit, otherwise None
+        """
+        with self._query_cache_lock:
+            cached = self._query_cache.get(cache_key)
+            if cached is not None:
+                expire_time, results_pickled = cached
+                if expire_time > time.time():
+                    self._query_cache.move_to_end(cache_key)
+                    # always return a new copy because the results will be updated by the caller
+                    return pickle.loads(results_pickled)
+                del self._query_cache[cache_key]
+
+        if self.mc is not None:
+            try:
+                results_pickled = self.mc.get(cache_key)
+                if results_pickled is not None:
+                    self._add_to_local_query_cache(cache_key, results_pickled)
+                    return pickle.loads(results_pickled)
+            except Exception as e:
+                self.logger.warning("Getting general search results from memcache failed!")
+                self.logger.debug(e, exc_info=True)
+        return None
+
+    def _add_query_results_to_cache(self, cache_key: str, results: typing.List[dict]) -> None:
+        """
+        Function used to add the results of a sparql query to both local cache and memcache
+        :param cache_key: the cache key of the query
+        :param results: the query results
+        :return: None
+        """
+        results_pickled = pickle.dumps(results)
+        self._add_to_local_query_cache(cache_key, results_pickled)
+        if self.mc is not None:
+            try:
+                if not self.mc.set(cache_key, results_pickled, time=QUERY_CACHE_EXPIRE_TIME):
+                    self.logger.warning("Pushing general search results to memcache failed! Maybe the size too big?")
+            except Exception as e:
+                self.logger.warning("Pushing general search results to memcache failed!")
+                self.logger.debug(e, exc_info=True)
+
+    def _add_to_local_query_cache(self, cache_key: str, results_pickled: bytes) -> None:
+        with self._query_cache_lock:
+            self._query_cache[cache_key] = (time.time() + QUERY_CACHE_EXPIRE_TIME, results_pickled)
+            self._query_cache.move_to_end(cache_key)
+            while len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+
     def parse_sparql_query(self, json_query, dataset, **kwargs) -> str:
         """
         parse the json query to a spaqrl query format
@@ -62,28 +225,9 @@ class Augment:
         :return: a string indicate the sparql query
         """
         # example of query variables: Chaves Los Angeles Sacramento
-        PREFIX = '''
-            prefix ps: <http://www.wikidata.org/prop/statement/>
-            prefix pq: <http://www.wikidata.org/prop/qualifier/>
-            prefix p: <http://www.wikidata.org/prop/>
-        '''
-        SELECTION = '''
-            SELECT ?dataset ?datasetLabel ?variableName ?variable ?score ?rank ?url ?file_type ?title ?start_time ?end_time ?time_granularity ?keywords ?extra_information
-        '''
-        STRUCTURE = '''
-            WHERE {
-                ?dataset rdfs:label ?datasetLabel.
-                ?dataset p:P2699/ps:P2699 ?url.
-                ?dataset p:P2701/ps:P2701 ?file_type.
-                ?dataset p:C2010/ps:C2010 ?extra_information.
-                ?dataset p:C2005 ?variable.
-                ?variable ps:C2005 ?variableName.
-                ?dataset p:P1476 ?title_url.
-                ?title_url ps:P1476 ?title .
-                ?dataset p:C2004 ?keywords_url.
-                ?keywords_url ps:C2004 ?keywords.
-        '''
-        spaqrl_query = PREFIX + SELECTION + STRUCTURE
+        # the required full text search blocks are put before the other parts of the structure
+        search_parts = []
+        query_parts = []
         need_keywords_search = "keywords_search" in json_query.keys() and json_query["keywords_search"] != []
         need_variables_search = "variables" in json_query.keys() and json_query["variables"] != {}
         need_temporal_search = "variables_search" in json_query.keys() and \
@@ -94,18 +238,18 @@ class Augment:
         need_augment_with_time = kwargs.get("augment_with_time", False)
         limit_amount = kwargs.get("limit_amount", config.default_search_limit)
         bind = ""
-        ORDER = "ORDER BY DESC(?score) ?title"
-        LIMIT = "LIMIT " + str(limit_amount)
+
+        selection_variables = list(QUERY_SELECTION_VARIABLES)
+        if need_temporal_search or need_augment_with_time:
+            selection_variables.extend(QUERY_SELECTION_TIME_VARIABLES)
+        selection_variables.extend(QUERY_SELECTION_EXTRA_VARIABLES)
+        selection = "\n            SELECT " + " ".join(selection_variables) + "\n        "
 
         if need_variables_search:
             query_variables = json_query['variables']
             query_part = " ".join(query_variables.values())
-            spaqrl_query += '''
-                ?variable pq:C2006 [
-                            bds:search """''' + query_part + '''""" ;
-                            bds:relevance ?score_var ;
-                          ].
-                '''
+            search_parts.append(QUERY_VARIABLES_SEARCH_TEMPLATE.substitute(query_part=query_part))
+            search_parts.append(QUERY_RUN_FIRST_HINT)
             bind = "?score_var" if bind == "" else bind + "+ ?score_var"
 
         if need_keywords_search:
@@ -115,10 +259,9 @@ class Augment:
 
             # updated v2019.11.1, for search_without_data, we should remove duplicates
             if dataset is None:
-                SELECTION = '''
-                            SELECT DISTINCT ?dataset ?datasetLabel ?score ?rank ?url ?file_type ?title ?keywords ?extra_information
-                            '''
-                spaqrl_query = PREFIX + SELECTION + STRUCTURE
+                selection = QUERY_SELECTION_DISTINCT
+                search_parts = []
+                query_parts = []
             else:
                 # updated v2019.11.1, now use fuzzy search, no longer use column names
                 pass
@@ -137,21 +280,7 @@ class Augment:
 
             query_part = " ".join(list(query_keywords_filtered))
 
-            spaqrl_query += '''
-                optional {
-                ?keywords_url ps:C2004 [
-                                bds:search """''' + query_part + '''""" ;
-                                bds:relevance ?score_key1 ;
-                              ].
-                }
-                
-                optional {
-                ?title_url ps:P1476 [
-                                bds:search """''' + query_part + '''""" ;
-                                bds:relevance ?score_key2 ;
-                              ].
-                }
-                '''
+            query_parts.append(QUERY_KEYWORDS_SEARCH_TEMPLATE.substitute(query_part=query_part))
             if bind == "":
                 bind = "IF(BOUND(?score_key1), ?score_key1, 0) + IF(BOUND(?score_key2), ?score_key2, 0)"
             else:
@@ -162,14 +291,9 @@ class Augment:
             start_date = pd.to_datetime(tv["start"]).isoformat()
             end_date = pd.to_datetime(tv["end"]).isoformat()
             granularity = Utils.map_granularity_to_value(tv["granularity"])
-            spaqrl_query += '''
-                ?variable pq:C2013 ?time_granularity .
-                ?variable pq:C2011 ?start_time .
-                ?variable pq:C2012 ?end_time .
-                FILTER(?time_granularity >= ''' + str(granularity) + ''')
-                FILTER(!((?start_time > "''' + end_date + '''"^^xsd:dateTime) || (?end_time < "''' + \
-                            start_date + '''"^^xsd:dateTime)))
-                '''
+            query_parts.append(QUERY_TEMPORAL_SEARCH_TEMPLATE.substitute(granularity=granularity,
+                                                                         start_date=start_date,
+                                                                         end_date=end_date))
 
         if need_geospatial_search:
             geo_variable = json_query["variables_search"]["geospatial_variable"]
@@ -178,12 +302,8 @@ class Augment:
                 # find similar dataset from datamart
                 query_part = " ".join(qnodes)
                 # query_part = "q1494 q1400 q759 q1649 q1522 q1387 q16551" # COMMENT: for testing
-                spaqrl_query += '''
-                                    ?variable pq:C2006 [
-                                        bds:search """''' + query_part + '''""" ;
-                                        bds:relevance ?score_geo ;
-                                    ].
-                                 '''
+                search_parts.append(QUERY_GEOSPATIAL_SEARCH_TEMPLATE.substitute(query_part=query_part))
+                search_parts.append(QUERY_RUN_FIRST_HINT)
                 bind = "?score_geo" if bind == "" else bind + "+ ?score_geo"
 
         # if "title_search" in json_query.keys() and json_query["title_search"] != '':
@@ -196,31 +316,20 @@ class Augment:
         #     '''
         #     bind = "?score_title" if bind == "" else bind + "+ ?score_title"
         if bind:
-            spaqrl_query += "\n BIND((" + bind + ") AS ?score) "
+            query_parts.append("\n BIND((" + bind + ") AS ?score) ")
 
         if need_keywords_search:
-            spaqrl_query += """
-                BIND((IF(BOUND(?score_key1), ?score_key1, 0) + IF(BOUND(?score_key2), ?score_key2, 0)) AS ?score_keywords)
-                filter (?score_keywords != 0)
-                """
+            query_parts.append(QUERY_KEYWORDS_SCORE_FILTER)
 
         if need_augment_with_time:
             time_info = json_query["variables_time"]
-            spaqrl_query += '''
-                ?dataset p:C2005 ?variable2.
-                ?variable2 pq:C2011 ?start_time.
-                ?variable2 pq:C2012 ?end_time.
-                ?variable2 pq:C2013 ?time_granularity.
-                FILTER(?time_granularity >= ''' + str(time_info['granularity']) + ''')
-                FILTER(!((?start_time > "''' + \
-                            time_info['start'] + \
-                            '''"^^xsd:dateTime) || (?end_time < "''' + \
-                            time_info['end'] + '''"^^xsd:dateTime)))
-            '''
+            query_parts.append(QUERY_AUGMENT_WITH_TIME_TEMPLATE.substitute(granularity=time_info['granularity'],
+                                                                           start_date=time_info['start'],
+                                                                           end_date=time_info['end']))
 
-        spaqrl_query += "\n }" + "\n" + ORDER + "\n" + LIMIT
+        query_parts.append("\n }" + "\n" + QUERY_ORDER + "\n" + "LIMIT " + str(limit_amount))
 
-        return spaqrl_query
+        return "".join([QUERY_PREFIX, selection, QUERY_WHERE] + search_parts + [QUERY_STRUCTURE] + query_parts)
 
     def parse_geospatial_query(self, geo_variable):
         geo_gra_dict = {'country': 'Q6256', 'state': 'Q7275', 'city': 'Q515', 'county': 'Q28575',
@@ -256,27 +365,42 @@ class Augment:
         return qnodes
 
     def get_dataset_time_information(self, dataset_id: str):
+        return self.get_datasets_time_information([dataset_id]).get(dataset_id, [])
 
-        query_body = """
-        prefix ps: <http://www.wikidata.org/prop/statement/>
-        prefix pq: <http://www.wikidata.org/prop/qualifier/>
-        prefix p: <http://www.wikidata.org/prop/>
-        
-        SELECT ?dataset ?score ?title ?start_time ?end_time ?time_granularity
-        
-        WHERE {
-            values ?dataset { <http://www.wikidata.org/entity/""" + dataset_id + """> }
-        
-          ?dataset p:C2005 ?variable.
-          ?variable pq:C2013 ?time_granularity .
-          ?variable pq:C2011 ?start_time .
-          ?variable pq:C2012 ?end_time .
-        }"""
-        try:
-            self.qm.setQuery(query_body)
-            results = self.qm.query().convert()['results']['bindings']
-        except Exception as e:
-            self.logger.error(e, exc_info=True)
-            traceback.print_exc()
-            return []
-        return results
+    def get_datasets_time_information(self, dataset_ids: typing.List[str]) -> typing.Dict[str, typing.List[dict]]:
+        """
+        Function used to get the time information of several datasets, the datasets are queried together
+        with a values clause so that only one query is needed for each chunk of datasets
+        :param dataset_ids: a list of the dataset ids
+        :return: a dict from each dataset id to its time information query results, datasets not found are not included
+        """
+        results_dict = dict()
+        dataset_ids = list(dataset_ids)
+        for chunk_start in range(0, len(dataset_ids), TIME_INFORMATION_QUERY_CHUNK_SIZE):
+            chunk_ids = dataset_ids[chunk_start: chunk_start + TIME_INFORMATION_QUERY_CHUNK_SIZE]
+            values_part = " ".join(["<http://www.wikidata.org/entity/" + each_id + ">" for each_id in chunk_ids])
+            query_body = """
+            prefix ps: <http://www.wikidata.org/prop/statement/>
+            prefix pq: <http://www.wikidata.org/prop/qualifier/>
+            prefix p: <http://www.wikidata.org/prop/>
+            
+            SELECT ?dataset ?score ?title ?start_time ?end_time ?time_granularity
+            
+            WHERE {
+                values ?dataset { """ + values_part + """ }
+            
+              ?dataset p:C2005 ?variable.
+              ?variable pq:C2013 ?time_granularity .
+              ?variable pq:C2011 ?start_time .
+              ?variable pq:C2012 ?end_time .
+            }"""
+            try:
+                results = run_sparql_query(self.general_search_server, query_body)['results']['bindings']
+            except Exception as e:
+                self.logger.error(e, exc_info=True)
+                traceback.print_exc()
+                continue
+            for each_result in results:
+                each_dataset_id = each_result['dataset']['value'].split('/')[-1]
+                results_dict.setdefault(each_dataset_id, []).append(each_result)
+        return results_dict
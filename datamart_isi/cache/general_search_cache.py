@@ -1,26 +1,36 @@
 from SPARQLWrapper import SPARQLWrapper, JSON, POST, URLENCODED
 import memcache
 import logging
-import hashlib
 import pickle
 import pandas as pd
 import datetime
 import typing
 import os
-import json
+import mmap
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from datamart_isi import config
 from datamart_isi.utilities import connection
 from datamart_isi.utilities.singleton import singleton
+from datamart_isi.utilities.hash_utils import get_str_hash
+from datamart_isi.utilities import json_utils
 from d3m.container import DataFrame as d3m_DataFrame
 from pandas.util import hash_pandas_object
 
 MEMCAHCE_MAX_VALUE_SIZE = config.memcache_max_value_size
+# results smaller than this are stored in memcache directly instead of the path to the file, it is kept small
+# so that the inline results do not take over the memory of the memcache server and evict the other keys
+MEMCACHE_INLINE_RESULTS_MAX_SIZE = 1024 * 1024
+_logger = logging.getLogger(__name__)
+# pool used to write the cache files in background, wait for all of them finished before exit
+_WRITE_POOL = ThreadPoolExecutor(max_workers=2)
+atexit.register(_WRITE_POOL.shutdown, wait=True)
 
 
 @singleton
 class GeneralSearchCache(object):
     def __init__(self, *,  memcache_max_value_size=MEMCAHCE_MAX_VALUE_SIZE):
-        self._logger = logging.getLogger(__name__)
+        self._logger = _logger
         self.memcache_server = connection.get_memcache_server_url()
         self.general_search_server = connection.get_general_search_server_url()
         self._logger.debug("Current memcache server url is: " + self.memcache_server)
@@ -49,37 +59,110 @@ class GeneralSearchCache(object):
         :param hash_key: the hash key of the query
         :return: the cached query in pickled format if the hash key hit, otherwise None
         """
-        if self.mc is not None:
-            # check whether we have cache or not
-            results = self.mc.get("augment_" + hash_key)
-            if results:
-                self._logger.info("Cache hit! will use this results.")
-                try:
-                    with open(results, "rb") as f:
-                        results_loaded = pickle.load(f)
-                    return results_loaded
-                except Exception as e:
-                    self._logger.warning("Hit results are broken! Need to rerun the query!")
-                    self._logger.debug(e, exc_info=True)
-            else:
-                self._logger.info("Cache not hit.")
-        else:
+        return self.get_cache_results_bulk([hash_key]).get(hash_key)
+
+    def get_cache_results_bulk(self, hash_keys: typing.List[str]) -> typing.Dict[str, typing.Any]:
+        """
+        Function used to check a batch of query hash tags in memcache system with only one round trip
+        :param hash_keys: the hash keys of the queries
+        :return: a dict from each hit hash key to its cached results, keys not hit or broken are not included
+        """
+        results_loaded = dict()
+        if self.mc is None:
             self._logger.info("No memcache server connected, skip cache searching.")
+            return results_loaded
+
+        hash_keys = list(hash_keys)
+        if len(hash_keys) == 0:
+            return results_loaded
+
+        # check whether we have cache or not
+        hit_values = self.mc.get_multi(hash_keys, key_prefix="augment_")
+        self._logger.info("Cache hit on {} of {} keys.".format(str(len(hit_values)), str(len(hash_keys))))
+        if len(hit_values) == 0:
+            return results_loaded
+
+        # small results are stored in memcache directly, others are loaded from disk, so load them in parallel
+        hit_keys = list(hit_values.keys())
+        with ThreadPoolExecutor(max_workers=min(8, len(hit_keys))) as executor:
+            futures = [executor.submit(self._load_cache_value, hit_values[each_key]) for each_key in hit_keys]
+        for each_key, each_future in zip(hit_keys, futures):
+            try:
+                results_loaded[each_key] = each_future.result()
+            except Exception as e:
+                self._logger.warning("Hit results of " + each_key + " are broken! Need to rerun the query!")
+                self._logger.debug(e, exc_info=True)
+        return results_loaded
+
+    @staticmethod
+    def _load_cache_value(cache_value):
+        """
+        Function used to load the results from the value stored in memcache
+        :param cache_value: the serialized results in bytes, or the path to the file of results in str
+        :return: the loaded results
+        """
+        if isinstance(cache_value, bytes):
+            return pickle.loads(cache_value)
+        # map the file into memory to unpickle from it directly instead of reading it into buffers first
+        with open(cache_value, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                return pickle.loads(mapped_file)
+
+    def _write_and_set(self, content: bytes, path: str, memcache_key: str) -> bool:
+        """
+        Function used to write the serialized content to disk and then push the path to memcache,
+        the key is pushed after the file is written so that nobody can get the path of a partially written file
+        :param content: the serialized content
+        :param path: the path of the file
+        :param memcache_key: the memcache key to store the path
+        :return: a bool represent the pushing is success or not
+        """
+        with open(path, "wb") as f:
+            f.write(content)
+        response_code = self.mc.set(memcache_key, path)
+        if not response_code:
+            self._logger.warning("Pushing " + memcache_key + " failed! Maybe the size too big?")
+        return response_code
+
+    def _write_and_set_in_background(self, content: bytes, path: str, memcache_key: str) -> None:
+        """
+        Function used to run _write_and_set in the write pool, so that the caller will not be blocked by disk writing
+        """
+        def log_failure(future):
+            e = future.exception()
+            if e is not None:
+                self._logger.error("Writing " + path + " for " + memcache_key + " failed!")
+                self._logger.debug(e, exc_info=e)
 
-        return None
+        _WRITE_POOL.submit(self._write_and_set, content, path, memcache_key).add_done_callback(log_failure)
 
-    def add_to_memcache(self, supplied_dataframe, search_result_serialized, augment_results, hash_key) -> bool:
+    def add_to_memcache(self, supplied_dataframe, search_result_serialized, augment_results, hash_key,
+                        supplied_dataframe_hash=None) -> bool:
+        """
+        Function used to push the augment results, the search result and the supplied data to memcache.
+        The keys stored in memcache directly are pushed before returning, while the results too large to be inline
+        and the supplied data are written to disk in background, their paths are pushed after the writing finished
+        :param supplied_dataframe: supplied dataframe
+        :param search_result_serialized: serialized search result
+        :param augment_results: the augment results
+        :param hash_key: the hash key of this augment
+        :param supplied_dataframe_hash: the result of get_supplied_dataframe_hash if already computed
+        :return: a bool represent the pushing of the keys stored in memcache directly is success or not, it does not
+                 cover the background writings, their failures are only logged when they finished
+        """
         try:
             self._logger.debug("Start pushing general augment result to " + self.memcache_server)
             # add query results
             if type(supplied_dataframe) is d3m_DataFrame or type(supplied_dataframe) is pd.DataFrame:
-                hash_supplied_dataframe = hash_pandas_object(supplied_dataframe).sum()
+                if supplied_dataframe_hash is None:
+                    supplied_dataframe_hash = self.get_supplied_dataframe_hash(supplied_dataframe)
+                hash_supplied_dataframe = supplied_dataframe_hash
             else:
                 raise ValueError("Unsupport type of supplied_data result as " + str(type(supplied_dataframe)) + "!")
 
             # add supplied data for further updating if needed
             try:
-                search_result_json = json.loads(search_result_serialized)
+                search_result_json = json_utils.loads(search_result_serialized)
                 if "wikifier_choice" in search_result_json:
                     storage_loc = os.path.join(config.cache_file_storage_base_loc, "wikifier_cache")
                 else:
@@ -88,33 +171,32 @@ class GeneralSearchCache(object):
                 storage_loc = os.path.join(config.cache_file_storage_base_loc, "other_cache")
 
             path_to_supplied_dataframe = os.path.join(storage_loc, str(hash_supplied_dataframe) + ".pkl")
-            path_to_augment_results = os.path.join(storage_loc, hash_key + ".pkl")
-
-            with open(path_to_augment_results, "wb") as f:
-                pickle.dump(augment_results, f)
-
-            response_code1 = self.mc.set("augment_" + hash_key, path_to_augment_results)
-            if not response_code1:
-                self._logger.warning("Pushing wikidata search result failed! Maybe the size too big?")
+            # serialize in current thread so that the results can be safely changed after returned,
+            # only the disk writing is done in background
+            augment_results_serialized = pickle.dumps(augment_results)
+            # the keys stored in memcache directly are pushed together with only one round trip
+            values_to_set = dict()
+            if len(augment_results_serialized) < MEMCACHE_INLINE_RESULTS_MAX_SIZE:
+                # small results are stored directly so that no disk access is needed when hit
+                values_to_set["augment_" + hash_key] = augment_results_serialized
+            else:
+                path_to_augment_results = os.path.join(storage_loc, hash_key) + ".pkl"
+                self._write_and_set_in_background(augment_results_serialized, path_to_augment_results,
+                                                  "augment_" + hash_key)
 
             # add timestamp to let the system know when to update
-            response_code2 = self.mc.set("timestamp_" + hash_key, str(datetime.datetime.now().timestamp()))
-            if not response_code2:
-                self._logger.warning("Pushing timestamp failed! What happened???")
-
-            with open(path_to_supplied_dataframe, "wb") as f:
-                pickle.dump(supplied_dataframe, f)
-            response_code3 = self.mc.set("supplied_data" + hash_key, path_to_supplied_dataframe)
-            if not response_code3:
-                self._logger.warning("Pushing supplied data failed! Maybe the size too big?")
-
+            values_to_set["timestamp_" + hash_key] = str(datetime.datetime.now().timestamp())
             # add search result
-            response_code4 = self.mc.set("search_result" + hash_key, search_result_serialized)
-            if not response_code4:
-                self._logger.warning("Pushing search result failed! Maybe the size too big?")
+            values_to_set["search_result" + hash_key] = search_result_serialized
+            failed_keys = self.mc.set_multi(values_to_set)
+            for each_key in failed_keys:
+                self._logger.warning("Pushing " + each_key + " failed! Maybe the size too big?")
+
+            self._write_and_set_in_background(pickle.dumps(supplied_dataframe), path_to_supplied_dataframe,
+                                              "supplied_data" + hash_key)
 
-            # only return True if all success
-            if response_code1 and response_code2 and response_code3 and response_code4:
+            # only return True if all keys stored directly success, the background writings are not waited
+            if len(failed_keys) == 0:
                 self._logger.info("Pushing search result success!")
                 return True
             else:
@@ -124,17 +206,29 @@ class GeneralSearchCache(object):
             self._logger.debug(e, exc_info=True)
             return False
 
-    def get_hash_key(self, supplied_dataframe: d3m_DataFrame, search_result_serialized: str) -> str:
+    @staticmethod
+    def get_supplied_dataframe_hash(supplied_dataframe: pd.DataFrame):
+        """
+        get the hash of the supplied dataframe used in the hash keys and the file names, it needs to hash every row
+        so the callers should compute it once and pass it to get_hash_key and add_to_memcache
+        :param supplied_dataframe: supplied dataframe
+        :return: the hash value
+        """
+        return hash_pandas_object(supplied_dataframe).sum()
+
+    def get_hash_key(self, supplied_dataframe: d3m_DataFrame, search_result_serialized: str,
+                     supplied_dataframe_hash=None) -> str:
         """
         get the hash key for the this general search result
         :param supplied_dataframe: supplied dataframe
         :param search_result_serialized: serialized search result
+        :param supplied_dataframe_hash: the result of get_supplied_dataframe_hash if already computed
         :return: a str represent the hash key
         """
-        hash_supplied_data = hash_pandas_object(supplied_dataframe).sum()
-        hash_generator = hashlib.md5()
-        hash_generator.update(search_result_serialized.encode('utf-8'))
-        hash_search_result = hash_generator.hexdigest()
+        if supplied_dataframe_hash is None:
+            supplied_dataframe_hash = self.get_supplied_dataframe_hash(supplied_dataframe)
+        hash_supplied_data = supplied_dataframe_hash
+        hash_search_result = get_str_hash(search_result_serialized)
         hash_key = str(hash_supplied_data) + str(hash_search_result)
         self._logger.debug("Current search's hash tag is " + hash_key)
         return hash_key
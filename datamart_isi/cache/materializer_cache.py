@@ -56,13 +56,13 @@ class MaterializerCache(object):
             label_part = "  ?itemLabel \n"
         else:
             label_part = "  ?item \n"
-        where_part = ""
         length = metadata.get("length", 100)
         column_name_suffix = metadata.get("suffix_col_name", "")
 
-        for i, each_p_node in enumerate(metadata["p_nodes_needed"]):
-            label_part += "  ?value" + str(i) + "Label\n"
-            where_part += "  ?item wdt:" + each_p_node + " ?value" + str(i) + ".\n"
+        # build the parts of each P node at once instead of adding them to the str one by one
+        label_part += "".join(["  ?value" + str(i) + "Label\n" for i in range(len(metadata["p_nodes_needed"]))])
+        where_part = "".join(["  ?item wdt:" + each_p_node + " ?value" + str(i) + ".\n"
+                              for i, each_p_node in enumerate(metadata["p_nodes_needed"])])
 
         sparql_query = """PREFIX wikibase: <http://wikiba.se/ontology#>
                                       PREFIX wd: <http://www.wikidata.org/entity/>
@@ -73,13 +73,12 @@ class MaterializerCache(object):
                        + "LIMIT " + str(length)
 
         results = WIKIDATA_CACHE_MANAGER.get_result(sparql_query)
-        all_res = {}
-        for i, result in enumerate(results):
-            each_res = {}
-            for each_key in result.keys():
-                each_res[each_key] = result[each_key]['value']
-            all_res[i] = each_res
-        df_res = pd.DataFrame.from_dict(all_res, "index")
+        # the columns are known from the query, so build the dataframe from the records with them directly
+        # instead of inferring the columns from a dict of dicts
+        columns = ["itemLabel" if show_item_label else "item"]
+        columns.extend(["value" + str(i) + "Label" for i in range(len(metadata["p_nodes_needed"]))])
+        records = [{each_key: each_value['value'] for each_key, each_value in result.items()} for result in results]
+        df_res = pd.DataFrame.from_records(records, columns=columns)
         column_names = df_res.columns.tolist()
         column_names = column_names[1:]
         column_names_replaced = {"itemLabel" if show_item_label else "item": "q_node"}
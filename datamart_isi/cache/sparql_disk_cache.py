@@ -0,0 +1,100 @@
+import logging
+import hashlib
+import os
+import threading
+import typing
+from datamart_isi import config
+from datamart_isi.utilities import json_utils
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+SPARQL_DISK_CACHE_LOC = os.path.join(config.cache_file_storage_base_loc, "sparql_cache")
+_logger = logging.getLogger(__name__)
+
+
+class SparqlDiskCache(object):
+    """
+    A persistent cache of sparql query results on local disk, so that the same queries from different processes
+    do not need to be sent to the servers again. It is only enabled when diskcache is installed.
+    """
+    _cache = None
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def _get_cache(cls):
+        if diskcache is None:
+            return None
+        if cls._cache is None:
+            with cls._cache_lock:
+                if cls._cache is None:
+                    try:
+                        cls._cache = diskcache.Cache(SPARQL_DISK_CACHE_LOC)
+                    except Exception as e:
+                        _logger.warning("Opening sparql disk cache at " + SPARQL_DISK_CACHE_LOC + " failed!")
+                        _logger.debug(e, exc_info=True)
+                        return None
+        return cls._cache
+
+    @staticmethod
+    def get_key(endpoint: str, query: str) -> str:
+        """
+        Function used to get the key of the query on given endpoint
+        :param endpoint: the url of the sparql endpoint
+        :param query: the sparql query in str format
+        :return: a str of the key
+        """
+        return hashlib.blake2b((endpoint + "\n" + query).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get(cls, endpoint: str, query: str) -> typing.Optional[typing.List[dict]]:
+        """
+        Function used to get the cached results of the query
+        :param endpoint: the url of the sparql endpoint
+        :param query: the sparql query in str format
+        :return: the query results if hit, otherwise None
+        """
+        cache = cls._get_cache()
+        if cache is None:
+            return None
+        try:
+            results_serialized = cache.get(cls.get_key(endpoint, query))
+            if results_serialized is None:
+                return None
+            return json_utils.loads(results_serialized)
+        except Exception as e:
+            _logger.warning("Getting query results from sparql disk cache failed!")
+            _logger.debug(e, exc_info=True)
+            return None
+
+    @classmethod
+    def set(cls, endpoint: str, query: str, results: typing.List[dict], expire: int = config.cache_expire_time) -> bool:
+        """
+        Function used to add the results of the query to disk cache
+        :param endpoint: the url of the sparql endpoint
+        :param query: the sparql query in str format
+        :param results: the query results
+        :param expire: seconds until the results expired
+        :return: a bool represent the adding is success or not
+        """
+        cache = cls._get_cache()
+        if cache is None:
+            return False
+        try:
+            return cache.set(cls.get_key(endpoint, query), json_utils.dumps(results), expire=expire)
+        except Exception as e:
+            _logger.warning("Adding query results to sparql disk cache failed!")
+            _logger.debug(e, exc_info=True)
+            return False
+
+    @classmethod
+    def reset_cache(cls) -> None:
+        """
+        Function used to remove all cached results on disk
+        :return: None
+        """
+        cache = cls._get_cache()
+        if cache is not None:
+            cache.clear()
+            _logger.info("Sparql disk cache at " + SPARQL_DISK_CACHE_LOC + " cleared.")
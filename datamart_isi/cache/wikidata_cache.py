@@ -1,20 +1,25 @@
-from SPARQLWrapper import SPARQLWrapper, JSON, POST, URLENCODED
 import memcache
 import logging
 import hashlib
 import pickle
 import datetime
 import typing
+import threading
 from datamart_isi import config
 from datamart_isi.utilities import connection
 from datamart_isi.utilities.singleton import singleton
+from datamart_isi.utilities.sparql_session import run_sparql_query
+from datamart_isi.cache.sparql_disk_cache import SparqlDiskCache
 MEMCAHCE_MAX_VALUE_SIZE = config.memcache_max_value_size
+# amount of the locks that the queries are sharded to by hash key
+QUERY_LOCKS_AMOUNT = 64
+_logger = logging.getLogger(__name__)
 
 
 @singleton
 class QueryCache(object):
     def __init__(self, *, memcache_max_value_size=MEMCAHCE_MAX_VALUE_SIZE):
-        self._logger = logging.getLogger(__name__)
+        self._logger = _logger
         self.memcache_server = connection.get_memcache_server_url()
         self.wikidata_server = connection.get_wikidata_server_url()
         self._logger.debug("Current memcache server url is: " + self.memcache_server)
@@ -26,11 +31,7 @@ class QueryCache(object):
             self.mc = None
             self._logger.error("Start memcache connection to " + self.memcache_server + " failed!")
             self._logger.debug(e, exc_info=True)
-
-        self.qm = SPARQLWrapper(self.wikidata_server)
-        self.qm.setReturnFormat(JSON)
-        self.qm.setMethod(POST)
-        self.qm.setRequestMethod(URLENCODED)
+        self._query_locks = [threading.Lock() for _ in range(QUERY_LOCKS_AMOUNT)]
 
     def get_result(self, query: str) -> typing.Optional[typing.List]:
         """
@@ -39,6 +40,11 @@ class QueryCache(object):
         :return: query results in list format if success get the result, otherwise None
         """
         hash_key = self.get_hash_key(query)
+        # same queries sent at the same time should wait for the first one instead of all running on server
+        with self._query_locks[int(hash_key, 16) % QUERY_LOCKS_AMOUNT]:
+            return self._get_result(query, hash_key)
+
+    def _get_result(self, query: str, hash_key: str) -> typing.Optional[typing.List]:
         results = self.get_cache_result(hash_key)
         cache_hit = False
         if results is not None:
@@ -54,8 +60,16 @@ class QueryCache(object):
             self._logger.info("Cache not hit, will run general query.")
 
         if not cache_hit:
+            # results from previous processes may still be on local disk
+            results = SparqlDiskCache.get(self.wikidata_server, query)
+            if results is not None:
+                self._logger.info("Disk cache hit! will use this results.")
+                if self.mc is not None:
+                    self.add_to_memcache(query, hash_key, results)
+                return results
             results = self.run_sparql_query(query, hash_key)
             if results is not None:
+                SparqlDiskCache.set(self.wikidata_server, query, results)
                 response = self.add_to_memcache(query, hash_key, results)
                 if not response:
                     self._logger.warning("Pushing some of the query failed! Please check!")
@@ -72,8 +86,7 @@ class QueryCache(object):
         """
         self._logger.debug("Start running wikidata query on " + self.wikidata_server)
         try:
-            self.qm.setQuery(query)
-            results = self.qm.query().convert()['results']['bindings']
+            results = run_sparql_query(self.wikidata_server, query)['results']['bindings']
             self._logger.debug("Running wikidata query success!")
         except Exception as e:
             self._logger.error("Query for " + hash_tag + " failed!")
@@ -16,6 +16,9 @@ cache_file_storage_base_loc = os.path.join(home_dir, "memcache_storage")
 memcache_max_value_size = 1024*1024*100
 # current cache expiration time is 24 hours
 cache_expire_time = 3600*24
+# general search results are only cached for a short time because datamart may be updated
+general_search_query_cache_expire_time = 300
+general_search_query_cache_size = 256
 
 # following are datamart detail configs, usually these should not be changed
 augmented_column_semantic_type = "https://metadata.datadrivendiscovery.org/types/Datamart_augmented_column"
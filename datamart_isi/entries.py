@@ -1,20 +1,23 @@
 import typing
 import pandas as pd
+import numpy as np
 import copy
 import os
 import random
 import collections
 import typing
 import logging
-import json
 import re
 import io
 import string
 import time
 import cgitb
+import heapq
+import zlib
+import warnings
 import sys
-from ast import literal_eval
-from itertools import combinations
+from operator import itemgetter, methodcaller
+from concurrent.futures import ThreadPoolExecutor
 
 from d3m import container
 from d3m import utils
@@ -30,6 +33,8 @@ from datamart_isi.augment import Augment
 from datamart_isi.joiners.rltk_joiner import RLTKJoinerGeneral
 from datamart_isi.joiners.rltk_joiner import RLTKJoinerWikidata
 from datamart_isi.utilities.utils import Utils
+from datamart_isi.utilities import json_utils
+from datamart_isi.utilities.hash_utils import get_str_hash
 from datamart_isi.utilities.timeout import timeout_call
 from datamart_isi.utilities.singleton import singleton
 from datamart_isi.utilities import d3m_wikifier
@@ -39,6 +44,10 @@ from datamart_isi.cache.wikidata_cache import QueryCache
 from datamart_isi.cache.general_search_cache import GeneralSearchCache
 from datamart_isi.cache.metadata_cache import MetadataCache
 from datamart_isi.cache.materializer_cache import MaterializerCache
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 # from datamart_isi.joiners.join_result import JoinResult
 # from datamart_isi.joiners.joiner_base import JoinerType
@@ -53,16 +62,70 @@ TEXT_SEMANTIC_TYPE = config.text_semantic_type
 ATTRIBUTE_SEMANTIC_TYPE = config.attribute_semantic_type
 AUGMENTED_COLUMN_SEMANTIC_TYPE = config.augmented_column_semantic_type
 TIME_SEMANTIC_TYPE = config.time_semantic_type
+# columns with any of these semantic types are used to generate the queries in search_with_data
+QUERY_COLUMN_SEMANTIC_TYPES = frozenset((TEXT_SEMANTIC_TYPE, TIME_SEMANTIC_TYPE))
+LOCATION_SEMANTIC_TYPE = "https://metadata.datadrivendiscovery.org/types/Location"
+# amount of values checked before parsing a whole text column with location semantic type as numbers
+LOCATION_CHECK_SAMPLE_SIZE = 100
+# granularities of the places found around the latitude and longitude, and the radius in km to find them
+GEOSPATIAL_SEARCH_GRANULARITIES = ('city',)
+GEOSPATIAL_SEARCH_RADIUS = 100
 
 MAX_ENTITIES_LENGTH = config.max_entities_length
+# for long text columns, only this times of MAX_ENTITIES_LENGTH rows are sampled before finding the distinct values
+ENTITIES_SAMPLE_ROWS_RATE = 4
 P_NODE_IGNORE_LIST = config.p_nodes_ignore_list
 SPECIAL_REQUEST_FOR_P_NODE = config.special_request_for_p_nodes
 AUGMENT_RESOURCE_ID = config.augmented_resource_id
 DEFAULT_DATAMART_URL = config.default_datamart_url
 TIME_COLUMN_MARK = config.time_column_mark
+# the max amount of Q nodes in each query when downloading from wikidata
+WIKIDATA_DOWNLOAD_CHUNK_SIZE = 500
+# the max amount of join column pairs checked at the same time when downloading general datamart datasets
+DOWNLOAD_FIND_PAIR_WORKERS = 4
+# used to replace all punctuations with spaces before splitting the values into words
+PUNCTUATION_TRANSLATOR = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+# a join column is only treated as time column if at least this rate of its values can be parsed as time
+TIME_JOIN_COLUMN_MIN_PARSED_RATE = 0.9
+# the return format of augment for each type of supplied data
+AUGMENT_RETURN_FORMATS = ((d3m_Dataset, "ds"), (d3m_DataFrame, "df"))
+# the sparql queries sent to wikidata, keep them unchanged so that the cached results can still be used,
+# they are filled with % formatting which is the cheapest way to render them
+WIKIDATA_PROPERTIES_QUERY_TEMPLATE = "select distinct ?item ?property where \n{\n  VALUES (?item) {%s" \
+                                     "  }\n  ?item ?property ?value .\n  ?wd_property wikibase:directClaim ?property ." \
+                                     "  values ( ?type ) \n  {\n    ( wikibase:Quantity )\n" \
+                                     "    ( wikibase:Time )\n    ( wikibase:Monolingualtext )\n  }" \
+                                     "  ?wd_property wikibase:propertyType ?type .\n}\norder by ?item ?property "
+WIKIDATA_DOWNLOAD_QUERY_TEMPLATE = "SELECT DISTINCT ?q %(p_nodes_query_part)s \nWHERE \n{\n  VALUES (?q) { \n " \
+                                   "%(q_nodes_query)s}\n%(p_nodes_optional_part)s%(special_request_part)s}\n"
+_logger = logging.getLogger(__name__)
 random.seed(42)
 
 
+def _time_scores_kernel(start_date, end_date, start_times, end_times):
+    """
+    compute the rate of the queried time range [start_date, end_date] covered by each dataset time range,
+    it is only used when numba is installed, otherwise the same scores are computed with numpy ufuncs
+    """
+    n = start_times.shape[0]
+    scores = np.zeros(n)
+    denominator = end_date - start_date
+    for i in range(n):
+        if denominator == 0.0:
+            # the query is only one time point, check whether the dataset covers it
+            if start_times[i] <= start_date and end_times[i] >= end_date:
+                scores[i] = 1.0
+        else:
+            overlap = min(end_date, end_times[i]) - max(start_date, start_times[i])
+            if overlap > 0.0:
+                scores[i] = overlap / denominator
+    return scores
+
+
+if njit is not None:
+    _time_scores_kernel = njit(cache=True)(_time_scores_kernel)
+
+
 class DatamartQueryCursor(object):
     """
     Cursor to iterate through Datamarts search results.
@@ -78,18 +141,14 @@ class DatamartQueryCursor(object):
                                   wikidata-related parts, it can help to improve the speed when processing large data
         :param connection_url: control paramter for the connection url
         """
-        self._logger = logging.getLogger(__name__)
+        self._logger = _logger
         if connection_url:
             self._logger.info("Using user-defined connection url as " + connection_url)
             self.connection_url = connection_url
         else:
             connection_url = os.getenv('DATAMART_URL_ISI', DEFAULT_DATAMART_URL)
             self.connection_url = connection_url
-        self.supplied_data = supplied_data
-        if type(self.supplied_data) is d3m_Dataset:
-            self.res_id, self.supplied_dataframe = d3m_utils.get_tabular_resource(dataset=self.supplied_data, resource_id=None)
-        else:
-            self.supplied_dataframe = self.supplied_data
+        self._set_supplied_data(supplied_data)
 
         self._logger.debug("Current datamart connection url is: " + self.connection_url)
         self.augmenter = augmenter
@@ -99,6 +158,13 @@ class DatamartQueryCursor(object):
         self.wikidata_cache_manager = QueryCache()
         self.q_nodes_columns = list()
         self.q_node_column_names = set()
+        # the results of _column_metadata, _find_time_columns and _find_time_ranges,
+        # they do not change unless supplied data changed
+        self._column_metadata_cache = None
+        self._column_semtypes_cache = None
+        self._columns_by_semtype_cache = None
+        self._time_columns_cache = None
+        self._time_ranges_cache = None
         if need_run_wikifier is None:
             self.need_run_wikifier = self._check_need_wikifier_or_not()
         else:
@@ -125,6 +191,7 @@ class DatamartQueryCursor(object):
             Maximum number of search results to return. None means no limit.
         timeout : int
             Maximum number of seconds before returning results. An empty list might be returned if it is reached.
+            The query timed out and the queries after it are searched again on the next call.
 
         Returns
         -------
@@ -140,61 +207,107 @@ class DatamartQueryCursor(object):
 
         # if need to run wikifier, run it before any search
         if self.current_searching_query_index == 0 and self.need_run_wikifier:
-            self.supplied_data = self.run_wikifier(self.supplied_data)
+            self._set_supplied_data(self.run_wikifier(self.supplied_data))
 
-        # if already remained enough part
-        current_result = self.remained_part or []
-        if len(current_result) > limit:
-            self.remained_part = current_result[limit:]
-            current_result = current_result[:limit]
-            return current_result
+        # if already remained enough part, they are sorted already so just take the page out from the front,
+        # instead of copying all of the remained results on each page
+        if self.remained_part is not None and len(self.remained_part) > limit:
+            return [self.remained_part.popleft() for _ in range(limit)]
+        current_result = list(self.remained_part or [])
+        self.remained_part = None
 
-        # start searching
-        while self.current_searching_query_index < len(self.search_query):
+        # start searching, the searches are mostly waiting for the responses from servers, so run them in parallel
+        search_functions = {
+            # TODO: now wikifier can only automatically search for all possible columns and do exact match
+            "wikidata": lambda query_index: self._search_wikidata(),
+            "general": lambda query_index: self._search_datamart(query_index),
+            "vector": lambda query_index: self._search_vector(),
+            "geospatial": lambda query_index: self._search_geospatial_data(query_index),
+        }
+        query_indexes = list(range(self.current_searching_query_index, len(self.search_query)))
+        for query_index in query_indexes:
+            if self.search_query[query_index].search_type not in search_functions:
+                raise ValueError("Unknown search query type for " + self.search_query[query_index].search_type)
+
+        if len(query_indexes) > 0:
             time_start = time.time()
-            self._logger.debug("Start searching on query No." + str(self.current_searching_query_index))
-
-            if self.search_query[self.current_searching_query_index].search_type == "wikidata":
-                # TODO: now wikifier can only automatically search for all possible columns and do exact match
-                search_res = timeout_call(timeout, self._search_wikidata, [])
-            elif self.search_query[self.current_searching_query_index].search_type == "general":
-                search_res = timeout_call(timeout, self._search_datamart, [])
-            elif self.search_query[self.current_searching_query_index].search_type == "vector":
-                search_res = timeout_call(timeout, self._search_vector, [])
-            elif self.search_query[self.current_searching_query_index].search_type == "geospatial":
-                search_res = timeout_call(timeout, self._search_geospatial_data, [])
-            else:
-                raise ValueError("Unknown search query type for " +
-                                 self.search_query[self.current_searching_query_index].search_type)
-
-            time_used = (time.time() - time_start)
-            timeout -= time_used
-            if search_res is not None:
-                self._logger.info("Running search on query No." + str(self.current_searching_query_index) + " used "
-                                  + str(time_used) + " seconds and finished.")
-                self._logger.info("Remained searching time: " + str(timeout) + " seconds.")
-            elif timeout <= 0:
-                self._logger.error(
-                    "Running search on query No." + str(self.current_searching_query_index) + " timeout!")
-                break
-            else:
-                self._logger.error("Running search on query No." + str(self.current_searching_query_index) + " failed!")
 
-            self.current_searching_query_index += 1
-            if search_res is not None:
-                self._logger.info("Totally {} results found.".format(str(len(search_res))))
-                current_result.extend(search_res)
+            def run_search(query_index):
+                search_start = time.time()
+                search_function = search_functions[self.search_query[query_index].search_type]
+                return timeout_call(timeout, search_function, [query_index]), time.time() - search_start
+
+            with ThreadPoolExecutor(max_workers=len(query_indexes)) as executor:
+                futures = dict()
+                for query_index in query_indexes:
+                    self._logger.debug("Start searching on query No." + str(query_index))
+                    futures[query_index] = executor.submit(run_search, query_index)
+
+            # collect the results in the order of queries, same as running them one by one, the queries after
+            # a timeout one are not finished, so they are searched again together with it on next page
+            for query_index in query_indexes:
+                search_res, time_used = futures[query_index].result()
+                if search_res is None and time_used >= timeout:
+                    self._logger.error("Running search on query No." + str(query_index) + " timeout!")
+                    break
+                self.current_searching_query_index = query_index + 1
+                if search_res is not None:
+                    self._logger.info("Running search on query No." + str(query_index) + " used "
+                                      + str(time_used) + " seconds and finished.")
+                    self._logger.info("Totally {} results found.".format(str(len(search_res))))
+                    current_result.extend(search_res)
+                else:
+                    self._logger.error("Running search on query No." + str(query_index) + " failed!")
+            self._logger.info("Running searches on {} queries used {} seconds.".format(str(len(query_indexes)),
+                                                                                    str(time.time() - time_start)))
 
         if len(current_result) == 0:
             self._logger.warning("No search results found!")
             return None
         else:
-            current_result = sorted(current_result, key=lambda x: x.score(), reverse=True)
-            if len(current_result) > limit:
-                self.remained_part = current_result[limit:]
-                current_result = current_result[:limit]
+            current_result, remained_part = self._split_top_results(current_result, limit)
+            if len(remained_part) > 0:
+                self.remained_part = collections.deque(remained_part)
             return current_result
 
+    @staticmethod
+    def _split_top_results(results: typing.List['DatamartSearchResult'], limit: typing.Optional[int]) \
+            -> typing.Tuple[typing.List['DatamartSearchResult'], typing.List['DatamartSearchResult']]:
+        """
+        Inner function used to pick the top results by score, the scores are only computed once for each result
+        :param results: the search results
+        :param limit: the amount of top results needed, None means all
+        :return: the top results and the remained results, both are sorted by score in descending order
+        """
+        # the negative index keeps the original order of results with same score, the same as a stable sort
+        scored = [(each.score(), -i, each) for i, each in enumerate(results)]
+        if limit is None or len(scored) <= limit:
+            scored.sort(reverse=True, key=itemgetter(0, 1))
+            return [each[2] for each in scored], []
+        top = heapq.nlargest(limit, scored, key=itemgetter(0, 1))
+        top_indexes = set(-each[1] for each in top)
+        remained = [each for each in scored if -each[1] not in top_indexes]
+        remained.sort(reverse=True, key=itemgetter(0, 1))
+        return [each[2] for each in top], [each[2] for each in remained]
+
+    def _set_supplied_data(self, supplied_data: typing.Union[d3m_DataFrame, d3m_Dataset]) -> None:
+        """
+        Inner function used to set the supplied data, the tabular resource and the column indices are found here once
+        so that all searches can use them directly
+        :param supplied_data: the supplied data for search
+        :return: None
+        """
+        self.supplied_data = supplied_data
+        if type(supplied_data) is d3m_Dataset:
+            self.res_id, self.supplied_dataframe = d3m_utils.get_tabular_resource(dataset=supplied_data, resource_id=None)
+        else:
+            self.res_id = None
+            self.supplied_dataframe = supplied_data
+        # keep the first index for duplicate column names, the same as list.index
+        self._column_name_to_index = dict()
+        for i, each_column_name in enumerate(self.supplied_dataframe.columns):
+            self._column_name_to_index.setdefault(each_column_name, i)
+
     def _check_need_wikifier_or_not(self) -> bool:
         """
         Check whether need to run wikifier or not, if wikidata type column detected, this column's semantic type will also be
@@ -203,44 +316,82 @@ class DatamartQueryCursor(object):
         True means Q nodes column already detected and skip running wikifier
         False means no Q nodes column detected, need to run wikifier
         """
-        need_wikifier_or_not, self.supplied_data = d3m_wikifier.check_and_correct_q_nodes_semantic_type(self.supplied_data)
+        need_wikifier_or_not, supplied_data = d3m_wikifier.check_and_correct_q_nodes_semantic_type(self.supplied_data)
+        self._set_supplied_data(supplied_data)
         if not need_wikifier_or_not:
             # if not need to run wikifier, we can find q node columns now
             self._find_q_node_columns()
         return need_wikifier_or_not
 
-    def _find_q_node_columns(self) -> None:
+    def _column_metadata(self) -> typing.List[dict]:
         """
-        Inner function used to find q node columns by semantic type
-        :return: None
+        Inner function used to get the metadata of each column in supplied data, the metadata is only queried once
+        and the results are cached until the supplied data changed (e.g. after wikifier)
+        :return: a list of metadata for each column
         """
-        if len(self.q_nodes_columns) > 0 or len(self.q_node_column_names) > 0:
-            self._logger.warning("Q node columns has already been found once! Should not run again")
-            self.q_node_column_names = set()
-            self.q_nodes_columns = list()
+        metadata_input = self.supplied_data.metadata
+        if self._column_metadata_cache is not None and self._column_metadata_cache[0] is metadata_input:
+            return self._column_metadata_cache[1]
 
         if type(self.supplied_data) is d3m_Dataset:
-            selector_base_type = "ds"
+            selector_base = (self.res_id, ALL_ELEMENTS)
         else:
-            selector_base_type = "df"
+            selector_base = (ALL_ELEMENTS,)
+        column_metadata = [metadata_input.query(selector_base + (i,)) for i in range(self.supplied_dataframe.shape[1])]
+        self._column_metadata_cache = (metadata_input, column_metadata)
+        return column_metadata
 
+    def _column_semtypes(self) -> typing.List[typing.FrozenSet[str]]:
+        """
+        Inner function used to get the semantic types of each column in supplied data, cached the same as
+        _column_metadata
+        :return: a list of semantic types set for each column
+        """
+        column_metadata = self._column_metadata()
+        if self._column_semtypes_cache is not None and self._column_semtypes_cache[0] is column_metadata:
+            return self._column_semtypes_cache[1]
+        column_semtypes = [frozenset(each.get("semantic_types", ())) for each in column_metadata]
+        self._column_semtypes_cache = (column_metadata, column_semtypes)
+        return column_semtypes
+
+    def _columns_by_semtype(self) -> typing.Dict[str, typing.List[int]]:
+        """
+        Inner function used to get the index from each semantic type to the columns with it in supplied data,
+        so that finding the columns of a semantic type do not need to check all columns, cached the same as
+        _column_metadata
+        :return: a dict from semantic type to the list of column indices in ascending order
+        """
+        column_semtypes = self._column_semtypes()
+        if self._columns_by_semtype_cache is not None and self._columns_by_semtype_cache[0] is column_semtypes:
+            return self._columns_by_semtype_cache[1]
+        columns_by_semtype = defaultdict(list)
+        for i, semantic_types in enumerate(column_semtypes):
+            for each_semantic_type in semantic_types:
+                columns_by_semtype[each_semantic_type].append(i)
+        # a plain dict so that looking up a not existed semantic type does not add it
+        columns_by_semtype = dict(columns_by_semtype)
+        self._columns_by_semtype_cache = (column_semtypes, columns_by_semtype)
+        return columns_by_semtype
+
+    def _find_q_node_columns(self) -> None:
+        """
+        Inner function used to find q node columns by semantic type
+        :return: None
+        """
         # check whether Qnode is given in the inputs, if given, use this to search
-        metadata_input = self.supplied_data.metadata
-        for i in range(self.supplied_dataframe.shape[1]):
-            if selector_base_type == "ds":
-                metadata_selector = (self.res_id, ALL_ELEMENTS, i)
-            else:
-                metadata_selector = (ALL_ELEMENTS, i)
-            if Q_NODE_SEMANTIC_TYPE in metadata_input.query(metadata_selector)["semantic_types"]:
-                # if no required variables given, attach any Q nodes found
-                self.q_nodes_columns.append(i)
-                self.q_node_column_names.add(self.supplied_dataframe.columns[i])
+        self.q_nodes_columns = list(self._columns_by_semtype().get(Q_NODE_SEMANTIC_TYPE, []))
+        self.q_node_column_names = set(self.supplied_dataframe.columns[i] for i in self.q_nodes_columns)
 
     def _find_time_ranges(self) -> dict:
         """
         inner function that used to find the time information from search queries
         :return: a dict with start time, end time and time granularity
         """
+        if self._time_ranges_cache is None:
+            self._time_ranges_cache = self._compute_time_ranges()
+        return self._time_ranges_cache
+
+    def _compute_time_ranges(self) -> dict:
         info = defaultdict(list)
         for i, each_search_query in enumerate(self.search_query):
             if each_search_query.search_type == "general":
@@ -276,35 +427,39 @@ class DatamartQueryCursor(object):
         return results
 
     def _search_wikidata(self, query=None, supplied_data: typing.Union[d3m_DataFrame, d3m_Dataset] = None,
-                         search_threshold=0.5) -> typing.List["DatamartSearchResult"]:
+                         search_threshold=0.5, q_nodes_columns: typing.List[int] = None) \
+            -> typing.List["DatamartSearchResult"]:
         """
         The search function used for wikidata search
         :param query: JSON object describing the query.
         :param supplied_data: the data you are trying to augment.
         :param search_threshold: the minimum appeared times of the properties
+        :param q_nodes_columns: the Q nodes columns to search, default is the Q nodes columns found on supplied data
         :return: list of search results of DatamartSearchResult
         """
         self._logger.debug("Start running search on wikidata...")
         if supplied_data is None:
             supplied_data = self.supplied_data
+        if q_nodes_columns is None:
+            q_nodes_columns = self.q_nodes_columns
 
         wikidata_results = []
         try:
-            if len(self.q_nodes_columns) == 0:
+            if len(q_nodes_columns) == 0:
                 self._logger.warning("No wikidata Q nodes detected on corresponding required_variables!")
                 self._logger.warning("Will skip wikidata search part")
                 return wikidata_results
 
             else:
                 self._logger.info("Wikidata Q nodes inputs detected! Will search with it.")
-                self._logger.info("Totally " + str(len(self.q_nodes_columns)) + " Q nodes columns detected!")
+                self._logger.info("Totally " + str(len(q_nodes_columns)) + " Q nodes columns detected!")
 
-                # do a wikidata search for each Q nodes column
-                for each_column in self.q_nodes_columns:
+                column_names = self.supplied_dataframe.columns
+                # find the Q nodes need to search for each Q nodes column first
+                columns_qnodes = []
+                blacklist_nodes = DownloadManager.fetch_blacklist_nodes()
+                for each_column in q_nodes_columns:
                     self._logger.debug("Start searching on column " + str(each_column))
-                    q_nodes_list = self.supplied_dataframe.iloc[:, each_column].tolist()
-                    p_count = collections.defaultdict(int)
-                    p_nodes_needed = []
                     # old method, the generated results are not very good
                     """
                     http_address = 'http://minds03.isi.edu:4444/get_properties'
@@ -318,54 +473,49 @@ class DatamartQueryCursor(object):
                             p_count[each_p] += 1
                     """
                     # TODO: temporary change to call wikidata service, may change back in the future
-                    # Q node format (wd:Q23)(wd: Q42)
-                    q_node_query_part = ""
                     # ensure every time we get same order of q nodes so the hash tag will be same
-                    unique_qnodes = set(q_nodes_list)
+                    unique_qnodes, _ = self._get_unique_qnodes(each_column)
                     # updated v2020.1.7, use blacklist to filter q nodes
-                    unique_qnodes = unique_qnodes - DownloadManager.fetch_blacklist_nodes()
-                    unique_qnodes = list(unique_qnodes)
-                    unique_qnodes.sort()
+                    if len(blacklist_nodes) > 0:
+                        unique_qnodes = unique_qnodes[~np.isin(unique_qnodes, list(blacklist_nodes))]
                     # updated v2020.1.6, not skip if unique Q nodes are too few
                     if len(unique_qnodes) == 0:
                         self._logger.warning("No Q nodes detected on column No.{} need to search, skip.".format(str(each_column)))
                         continue
                     if len(unique_qnodes) > config.max_q_node_query_size:
-                        unique_qnodes = random.sample(unique_qnodes, config.max_q_node_query_size)
-
-                    for each in unique_qnodes:
-                        if len(each) > 0:
-                            q_node_query_part += "(wd:" + each + ")"
-                    sparql_query = "select distinct ?item ?property where \n{\n  VALUES (?item) {" + q_node_query_part \
-                                   + "  }\n  ?item ?property ?value .\n  ?wd_property wikibase:directClaim ?property ." \
-                                   + "  values ( ?type ) \n  {\n    ( wikibase:Quantity )\n" \
-                                   + "    ( wikibase:Time )\n    ( wikibase:Monolingualtext )\n  }" \
-                                   + "  ?wd_property wikibase:propertyType ?type .\n}\norder by ?item ?property "
-
-                    results = self.wikidata_cache_manager.get_result(sparql_query)
-
-                    if results is None:
-                        # if response none, it means get wikidata query results failed
+                        # seeded by the column name so the same Q nodes are sampled (and so the same queries are sent)
+                        # every time, no matter the order in which the columns or cursors are searched
+                        rng = random.Random(zlib.crc32(str(column_names[each_column]).encode('utf-8')))
+                        unique_qnodes = heapq.nsmallest(config.max_q_node_query_size, unique_qnodes,
+                                                        key=lambda _: rng.random())
+
+                    columns_qnodes.append((each_column, unique_qnodes))
+
+                # the Q nodes of all columns are searched together, the returned items are then counted for each column
+                all_qnodes = sorted(set(each for _, unique_qnodes in columns_qnodes
+                                        for each in unique_qnodes if len(each) > 0))
+                item_properties, failed_qnodes = self._get_wikidata_properties(all_qnodes)
+
+                for each_column, unique_qnodes in columns_qnodes:
+                    if not failed_qnodes.isdisjoint(unique_qnodes):
+                        # if some Q nodes failed on query, the counts of this column will be wrong
                         self._logger.error("Can't get wikidata search results for column No." + str(each_column) + "(" +
-                                           self.supplied_dataframe.columns[each_column] + ")")
+                                           column_names[each_column] + ")")
                         continue
 
                     self._logger.debug("Response from server for column No." + str(each_column) + "(" +
-                                       self.supplied_dataframe.columns[each_column] + ")" +
+                                       column_names[each_column] + ")" +
                                        " received, start parsing the returned data from server.")
                     # count the appeared times and find the p nodes appeared  rate that higher than threshold
-                    for each in results:
-                        if "property" not in each:
-                            self._logger.error("Wikidata query returned wrong results!!! Please check!!!")
-                            raise ValueError("Wikidata query returned wrong results!!! Please check!!!")
-
-                        p_count[each['property']['value'].split("/")[-1]] += 1
-
-                    for key, val in p_count.items():
-                        if float(val) / len(unique_qnodes) >= search_threshold:
-                            p_nodes_needed.append(key)
+                    column_properties = [each_property for each_qnode in unique_qnodes
+                                         for each_property in item_properties.get(each_qnode, ())]
+                    if len(column_properties) > 0:
+                        properties, counts = np.unique(np.array(column_properties, dtype=object), return_counts=True)
+                        p_nodes_needed = properties[counts / len(unique_qnodes) >= search_threshold].tolist()
+                    else:
+                        p_nodes_needed = []
                     wikidata_search_result = {"p_nodes_needed": p_nodes_needed,
-                                              "target_q_node_column_name": self.supplied_dataframe.columns[each_column]}
+                                              "target_q_node_column_name": column_names[each_column]}
                     wikidata_results.append(DatamartSearchResult(search_result=wikidata_search_result,
                                                                  supplied_data=supplied_data,
                                                                  query_json=query,
@@ -382,15 +532,65 @@ class DatamartQueryCursor(object):
         finally:
             return wikidata_results
 
-    def _search_datamart(self) -> typing.List["DatamartSearchResult"]:
+    def _get_unique_qnodes(self, column_index: int) -> typing.Tuple[np.ndarray, int]:
+        """
+        Inner function used to get the distinct Q nodes of given column in sorted order, empty values are ignored
+        :param column_index: the index of the Q nodes column in supplied dataframe
+        :return: an array of the distinct Q nodes and the amount of the not empty values in the column
+        """
+        q_nodes_values = self.supplied_dataframe.iloc[:, column_index].dropna().values
+        q_nodes_values = q_nodes_values[q_nodes_values != ""]
+        unique_qnodes = pd.unique(q_nodes_values)
+        unique_qnodes.sort()
+        return unique_qnodes, len(q_nodes_values)
+
+    def _get_wikidata_properties(self, qnodes: typing.List[str]) \
+            -> typing.Tuple[typing.Dict[str, typing.List[str]], typing.Set[str]]:
+        """
+        Inner function used to get the properties of given Q nodes from wikidata, the Q nodes are split into chunks
+        so that each query will not be too big, and the chunks are queried at the same time
+        :param qnodes: a list of Q nodes
+        :return: a dict from each Q node to its distinct properties, and a set of Q nodes that failed to query
+        """
+        qnodes_chunks = [qnodes[i: i + config.max_q_node_query_size]
+                         for i in range(0, len(qnodes), config.max_q_node_query_size)]
+        sparql_queries = []
+        for each_chunk in qnodes_chunks:
+            # Q node format (wd:Q23)(wd: Q42)
+            q_node_query_part = "".join(["(wd:" + each + ")" for each in each_chunk])
+            sparql_queries.append(WIKIDATA_PROPERTIES_QUERY_TEMPLATE % q_node_query_part)
+
+        chunks_results = []
+        if len(sparql_queries) > 0:
+            with ThreadPoolExecutor(max_workers=min(8, len(sparql_queries))) as executor:
+                chunks_results = list(executor.map(self.wikidata_cache_manager.get_result, sparql_queries))
+
+        item_properties = collections.defaultdict(list)
+        failed_qnodes = set()
+        for each_chunk, results in zip(qnodes_chunks, chunks_results):
+            if results is None:
+                failed_qnodes.update(each_chunk)
+                continue
+            for each in results:
+                if "property" not in each:
+                    self._logger.error("Wikidata query returned wrong results!!! Please check!!!")
+                    raise ValueError("Wikidata query returned wrong results!!! Please check!!!")
+                item_properties[each['item']['value'].rpartition("/")[2]].append(each['property']['value'].rpartition("/")[2])
+        return item_properties, failed_qnodes
+
+    def _search_datamart(self, query_index: int = None) -> typing.List["DatamartSearchResult"]:
         """
         function used for searching in datamart with blaze graph database
+        :param query_index: the index of the search query to run, default is current searching query
         :return: List[DatamartSearchResult]
         """
         self._logger.debug("Start searching on datamart...")
+        if query_index is None:
+            query_index = self.current_searching_query_index
         search_result = []
-        variables_search = self.search_query[self.current_searching_query_index].variables_search
-        keywords_search = self.search_query[self.current_searching_query_index].keywords_search
+        search_query = self.search_query[query_index]
+        variables_search = search_query.variables_search
+        keywords_search = search_query.keywords_search
         # COMMENT: title does not used, may delete later
         variables, title = dict(), dict()
         variables_temp = dict()  # this temp is specially used to store variable for time query
@@ -400,9 +600,10 @@ class DatamartQueryCursor(object):
                 self._logger.warning("Required to search with time but no time column found from supplied data!")
                 return []
 
-        for each_variable in self.search_query[self.current_searching_query_index].variables:
+        for each_variable in search_query.variables:
+            variable_key = each_variable.key
             # updated v2019.12.11, now we only search "time column only" if augment_with_time is set to false
-            if each_variable.key.startswith(TIME_COLUMN_MARK):
+            if variable_key.startswith(TIME_COLUMN_MARK):
                 if self.augment_with_time:
                     self._logger.warning("Not search with time only if augment_with_time is set to True")
                     return []
@@ -410,8 +611,9 @@ class DatamartQueryCursor(object):
                     self._logger.warning("Not search with time only if consider_time is set to False")
                     return []
                 else:
-                    variables_temp[each_variable.key.split("____")[1]] = each_variable.values
-                    start_time, end_time, granularity = each_variable.values.split("____")
+                    variable_values = each_variable.values
+                    variables_temp[variable_key.split("____")[1]] = variable_values
+                    start_time, end_time, granularity = variable_values.split("____")
                     variables_search = {
                         "temporal_variable":
                             {
@@ -422,14 +624,14 @@ class DatamartQueryCursor(object):
                     }
             else:
                 # updated v2019.12.18: if consider wikifier columns only, not search on other columns
-                if self.consider_wikifier_columns_only and each_variable.key not in self.q_node_column_names:
+                if self.consider_wikifier_columns_only and variable_key not in self.q_node_column_names:
                     self._logger.warning(
-                        "Set to consider wikifier columns only, will not search for column {}".format(each_variable.key))
+                        "Set to consider wikifier columns only, will not search for column {}".format(variable_key))
                     return []
 
-                variables[each_variable.key] = each_variable.values
+                variables[variable_key] = each_variable.values
 
-        query = {"keywords": self.search_query[self.current_searching_query_index].keywords,
+        query = {"keywords": search_query.keywords,
                  "variables": variables,
                  "keywords_search": keywords_search,
                  "variables_search": variables_search,
@@ -447,43 +649,25 @@ class DatamartQueryCursor(object):
         if len(variables_temp) != 0:
             query["variables"] = variables_temp
 
-        for i, each_result in enumerate(query_results):
-            # self._logger.debug("Get returned No." + str(i) + " query result as ")
-            # self._logger.debug(str(each_result))
-
-            # the special way to calculate the score of temporal variable search
-            if "start_time" in each_result.keys() and "end_time" in each_result.keys():
-                if self.augment_with_time:
-                    tv = time_information
-                else:
-                    tv = query["variables_search"]["temporal_variable"]
-                start_date = pd.to_datetime(tv["start"]).timestamp()
-                end_date = pd.to_datetime(tv["end"]).timestamp()  # query time
-                start_time = pd.to_datetime(each_result['start_time']['value']).timestamp()
-                end_time = pd.to_datetime(each_result['end_time']['value']).timestamp()  # dataset
-
-                denominator = float(end_date - start_date)
-                if end_date > end_time:
-                    if start_date > end_time:
-                        time_score = 0.0
-                    elif start_date >= start_time and end_time >= start_date:
-                        time_score = (end_time - start_date) / denominator
-                    elif start_time > start_date:
-                        time_score = (end_time - start_time) / denominator
-                elif end_date >= start_time and end_time >= end_date:
-                    if start_date >= start_time:
-                        time_score = 1.0
-                    elif start_time > start_date:
-                        time_score = (end_date - start_time) / denominator
-                elif start_time > end_date:
-                    time_score = 0.0
-
+        # the special way to calculate the score of temporal variable search, all results are computed together
+        time_results = [each_result for each_result in query_results
+                        if "start_time" in each_result.keys() and "end_time" in each_result.keys()]
+        if len(time_results) > 0:
+            if self.augment_with_time:
+                tv = time_information
+            else:
+                tv = query["variables_search"]["temporal_variable"]
+            time_scores = self._compute_time_scores(tv, time_results)
+            for each_result, time_score in zip(time_results, time_scores.tolist()):
                 if time_score != 0.0 and 'score' in each_result.keys():
                     old_score = float(each_result['score']['value'])
                     each_result['score']['value'] = old_score + time_score
                 else:
                     each_result['score'] = {"value": time_score}
 
+        for i, each_result in enumerate(query_results):
+            # self._logger.debug("Get returned No." + str(i) + " query result as ")
+            # self._logger.debug(str(each_result))
             temp = DatamartSearchResult(search_result=each_result, supplied_data=self.supplied_data, query_json=query,
                                         search_type="general")
             search_result.append(temp)
@@ -497,6 +681,32 @@ class DatamartQueryCursor(object):
 
         return search_result
 
+    @staticmethod
+    def _compute_time_scores(time_range: dict, time_results: typing.List[dict]) -> np.ndarray:
+        """
+        Inner function used to compute the time score of the general search results, the score is the rate of the
+        queried time range covered by the time range of the dataset
+        :param time_range: a dict with the start and end time of the query
+        :param time_results: the query results with start_time and end_time
+        :return: an array of the time score of each result
+        """
+        start_date = pd.to_datetime(time_range["start"]).timestamp()
+        end_date = pd.to_datetime(time_range["end"]).timestamp()  # query time
+        epoch = pd.Timestamp("1970-01-01", tz="UTC")
+        start_times = ((pd.to_datetime([each['start_time']['value'] for each in time_results], utc=True) - epoch)
+                       / pd.Timedelta(seconds=1)).values
+        end_times = ((pd.to_datetime([each['end_time']['value'] for each in time_results], utc=True) - epoch)
+                     / pd.Timedelta(seconds=1)).values  # dataset
+
+        if njit is not None:
+            return _time_scores_kernel(float(start_date), float(end_date), start_times, end_times)
+        denominator = float(end_date - start_date)
+        if denominator == 0.0:
+            # the query is only one time point, check whether the dataset covers it
+            return ((start_times <= start_date) & (end_times >= end_date)).astype(float)
+        overlap = np.minimum(end_date, end_times) - np.maximum(start_date, start_times)
+        return np.clip(overlap, 0.0, None) / denominator
+
     def _search_vector(self) -> typing.List["DatamartSearchResult"]:
         """
         The search function used for vector search
@@ -516,19 +726,17 @@ class DatamartQueryCursor(object):
                 # do a vector search for each Q nodes column
                 for each_column in self.q_nodes_columns:
                     self._logger.debug("Start searching on column " + str(each_column))
-                    q_nodes_list = list(filter(None, self.supplied_dataframe.iloc[:, each_column].dropna().tolist()))
-                    unique_qnodes = list(set(q_nodes_list))
-                    unique_qnodes.sort()
+                    unique_qnodes, q_nodes_amount = self._get_unique_qnodes(each_column)
                     # updated v2020.1.6, not skip if unique Q nodes are too few
-                    if len(unique_qnodes) < config.min_q_node_query_size_percent * len(q_nodes_list):
+                    if len(unique_qnodes) < config.min_q_node_query_size_percent * q_nodes_amount:
                         self._logger.warning("Too few Q nodes (rate = {}/{}) found on column {}, will skip this column.".
                                              format(str(len(unique_qnodes)),
-                                                    str(config.min_q_node_query_size_percent * len(q_nodes_list)),
+                                                    str(config.min_q_node_query_size_percent * q_nodes_amount),
                                                     str(each_column)))
                         continue
                     vector_search_result = {"number_of_vectors": str(len(unique_qnodes)),
                                             "target_q_node_column_name": self.supplied_dataframe.columns[each_column],
-                                            "q_nodes_list": unique_qnodes}
+                                            "q_nodes_list": unique_qnodes.tolist()}
                     vector_results.append(DatamartSearchResult(search_result=vector_search_result,
                                                                supplied_data=self.supplied_data,
                                                                query_json=None,
@@ -544,32 +752,69 @@ class DatamartQueryCursor(object):
         finally:
             return vector_results
 
-    def _search_geospatial_data(self) -> typing.List["DatamartSearchResult"]:
+    def _find_location_columns(self) -> typing.List[int]:
+        """
+        Inner function used to find the columns with location semantic type
+        :return: a list of the column indices
+        """
+        return list(self._columns_by_semtype().get(LOCATION_SEMANTIC_TYPE, []))
+
+    def _location_columns_min_max(self) -> typing.Dict[int, typing.Tuple[float, float]]:
+        """
+        Inner function used to get the min and max value of each location column in one vectorized pass,
+        columns which are not numeric or do not have any value are not included
+        :return: a dict from column index to its (min, max) values
+        """
+        location_columns = self._find_location_columns()
+        if len(location_columns) == 0:
+            return {}
+        columns_data = np.full((self.supplied_dataframe.shape[0], len(location_columns)), np.nan)
+        for i, each in enumerate(location_columns):
+            column_data = self.supplied_dataframe.iloc[:, each]
+            if column_data.dtype.kind in "iuf":
+                # already numeric, no parsing needed
+                columns_data[:, i] = column_data.values
+                continue
+            if column_data.dtype.kind != "O":
+                # bool, datetime and other typed columns can not be coordinates
+                continue
+            # check a small sample first so that most of the text columns are skipped without parsing the whole column
+            sample = column_data.dropna().head(LOCATION_CHECK_SAMPLE_SIZE)
+            if pd.to_numeric(sample, errors="coerce").isna().any():
+                continue
+            # parse without raising, columns with any value can not be parsed are not numeric and skipped
+            column_numeric = pd.to_numeric(column_data, errors="coerce")
+            if column_numeric.isna().sum() == column_data.isna().sum():
+                columns_data[:, i] = column_numeric.values
+
+        with warnings.catch_warnings():
+            # columns with all nan values will get nan results, which will be removed below
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            columns_min = np.nanmin(columns_data, axis=0)
+            columns_max = np.nanmax(columns_data, axis=0)
+        valid_mask = ~np.isnan(columns_min)
+        return {each: (float(columns_min[i]), float(columns_max[i]))
+                for i, each in enumerate(location_columns) if valid_mask[i]}
+
+    def _search_geospatial_data(self, query_index: int = None) -> typing.List["DatamartSearchResult"]:
         """
         function used for searching geospatial data
+        :param query_index: the index of the search query to run, default is current searching query
         :return: List[DatamartSearchResult]
         """
         self._logger.debug("Start searching geospatial data on wikidata and datamart...")
+        if query_index is None:
+            query_index = self.current_searching_query_index
         search_results = []
 
         # try to find possible columns of latitude and longitude
         possible_longitude_or_latitude = []
-        for each in range(len(self.supplied_dataframe.columns)):
-            if type(self.supplied_data) is d3m_Dataset:
-                selector = (self.res_id, ALL_ELEMENTS, each)
-            else:
-                selector = (ALL_ELEMENTS, each)
-            each_column_meta = self.supplied_data.metadata.query(selector)
-
-            if "https://metadata.datadrivendiscovery.org/types/Location" in each_column_meta["semantic_types"]:
-                try:
-                    column_data = self.supplied_dataframe.iloc[:, each].astype(float).dropna()
-                    if max(column_data) <= config.max_longitude_val and min(column_data) >= config.min_longitude_val:
-                        possible_longitude_or_latitude.append(each)
-                    elif max(column_data) <= config.max_latitude_val and min(column_data) >= config.min_latitude_val:
-                        possible_longitude_or_latitude.append(each)
-                except:
-                    pass
+        columns_min_max = self._location_columns_min_max()
+        for each, (column_min, column_max) in columns_min_max.items():
+            if column_max <= config.max_longitude_val and column_min >= config.min_longitude_val:
+                possible_longitude_or_latitude.append(each)
+            elif column_max <= config.max_latitude_val and column_min >= config.min_latitude_val:
+                possible_longitude_or_latitude.append(each)
 
         if len(possible_longitude_or_latitude) < 2:
             self._logger.debug("Supplied dataset does not have geospatial data!")
@@ -578,87 +823,128 @@ class DatamartQueryCursor(object):
             self._logger.debug(
                 "Finding columns:" + str(possible_longitude_or_latitude) + " which might be geospatial data columns...")
 
-        possible_la_or_long_comb = list(combinations(possible_longitude_or_latitude, 2))
-        for column_index_comb in possible_la_or_long_comb:
-            latitude_index, longitude_index = -1, -1
-            # try to get the correct latitude and longitude pairs
-            for each_column_index in column_index_comb:
-                try:
-                    column_data = self.supplied_dataframe.iloc[:, each_column_index].astype(float).dropna()
-                    column_name = self.supplied_dataframe.columns[each_column_index]
-
-                    # must be longitude when its min is in [-180, -90), or max is in (90, 180]
-                    if config.max_latitude_val < max(column_data) <= config.max_longitude_val \
-                            or (config.min_latitude_val > min(column_data) >= config.min_longitude_val):
-                        longitude_index = each_column_index
-                    else:
-                        # determine the type by header [latitude, longitude]
-                        if any([True for i in column_name if i in ['a', 'A']]):
-                            latitude_index = each_column_index
-                        elif any([True for i in column_name if i in ['o', 'O', 'g', 'G']]):
-                            longitude_index = each_column_index
-
-                except Exception as e:
-                    self._logger.debug(e, exc_info=True)
-                    self._logger.error("Can't parse location information for column No." + str(each_column_index)
-                                       + " with column name " + column_name)
-
+        # the type of each column only depends on itself, so decide them once instead of on every pair
+        column_names = self.supplied_dataframe.columns
+        latitude_columns, longitude_columns = [], []
+        for each_column_index in possible_longitude_or_latitude:
+            column_min, column_max = columns_min_max[each_column_index]
+            column_name_chars = set(str(column_names[each_column_index]).lower())
+            # must be longitude when its min is in [-180, -90), or max is in (90, 180]
+            if config.max_latitude_val < column_max <= config.max_longitude_val \
+                    or (config.min_latitude_val > column_min >= config.min_longitude_val):
+                longitude_columns.append(each_column_index)
+            # determine the type by header [latitude, longitude]
+            elif "a" in column_name_chars:
+                latitude_columns.append(each_column_index)
+            elif "o" in column_name_chars or "g" in column_name_chars:
+                longitude_columns.append(each_column_index)
+
+        # only pairs of one latitude and one longitude column can be used, search them in the order of the columns
+        latitude_longitude_pairs = sorted(((latitude_index, longitude_index) for latitude_index in latitude_columns
+                                           for longitude_index in longitude_columns), key=sorted)
+        for latitude_index, longitude_index in latitude_longitude_pairs:
             # search on datamart and wikidata by city qnodes
-            if latitude_index != -1 and longitude_index != -1:
-                self._logger.info(
-                    "Latitude column is: " + str(latitude_index) + " and longitude is: " + str(longitude_index) + "...")
-                granularity = {'city'}
-                radius = 100
-
-                for gran in granularity:
-                    search_variables = {'metadata': {
-                        'search_result': {
-                            'latitude_index': latitude_index,
-                            'longitude_index': longitude_index,
-                            'radius': radius,
-                            'granularity': gran
-                        },
-                        'search_type': 'geospatial'
-                    }}
-                    # do wikidata query service to find city q-node columns
-                    return_ds = DownloadManager.query_geospatial_wikidata(self.supplied_data, search_variables,
-                                                                          self.connection_url)
-                    _, return_df = d3m_utils.get_tabular_resource(dataset=return_ds, resource_id=None)
-
-                    if return_df.columns[-1].startswith('Geo_') and return_df.columns[-1].endswith('_wikidata'):
-                        qnodes = return_df.iloc[:, -1]
-                        qnodes_set = list(set(qnodes))
-                        coverage_score = len(qnodes_set) / len(qnodes)
-
-                        # search on datamart
-                        qnodes_str = " ".join(qnodes_set)
-                        variables = [VariableConstraint(key=return_df.columns[-1], values=qnodes_str)]
-                        self.search_query[self.current_searching_query_index].variables = variables
-                        search_res = timeout_call(1800, self._search_datamart, [])
-                        search_results.extend(search_res)
-
-                        # search on wikidata
-                        temp_q_nodes_columns = self.q_nodes_columns
-                        self.q_nodes_columns = [-1]
-                        search_res = timeout_call(1800, self._search_wikidata, [None, return_df])
-                        search_results.extend(search_res)
-                        self.q_nodes_columns = temp_q_nodes_columns
-
-        if search_results:
-            for each_result in search_results:
-                # change metadata's score
-                old_score = each_result.score()
-                new_score = old_score * coverage_score
-                each_result.metadata_manager.score = new_score
-                # change score in datamart_search_result
-                if "score" in each_result.search_result.keys():
-                    each_result.search_result["score"]["value"] = new_score
-
-            search_results.sort(key=lambda x: x.score(), reverse=True)
+            self._logger.info(
+                "Latitude column is: " + str(latitude_index) + " and longitude is: " + str(longitude_index) + "...")
+            for gran in GEOSPATIAL_SEARCH_GRANULARITIES:
+                search_variables = {'metadata': {
+                    'search_result': {
+                        'latitude_index': latitude_index,
+                        'longitude_index': longitude_index,
+                        'radius': GEOSPATIAL_SEARCH_RADIUS,
+                        'granularity': gran
+                    },
+                    'search_type': 'geospatial'
+                }}
+                # do wikidata query service to find city q-node columns
+                return_ds = DownloadManager.query_geospatial_wikidata(self.supplied_data, search_variables,
+                                                                      self.connection_url)
+                _, return_df = d3m_utils.get_tabular_resource(dataset=return_ds, resource_id=None)
+
+                if return_df.columns[-1].startswith('Geo_') and return_df.columns[-1].endswith('_wikidata'):
+                    qnodes = return_df.iloc[:, -1].values
+                    # pd.unique keeps the order of first appearance, so the same query is generated every time
+                    qnodes_set = pd.unique(qnodes)
+                    coverage_score = len(qnodes_set) / len(qnodes)
+
+                    # search on datamart
+                    qnodes_str = " ".join(qnodes_set.tolist())
+                    variables = [VariableConstraint(key=return_df.columns[-1], values=qnodes_str)]
+                    self.search_query[query_index].variables = variables
+                    # the searches on datamart and wikidata do not depend on each other, so run them in parallel
+                    with ThreadPoolExecutor(max_workers=2) as executor:
+                        datamart_future = executor.submit(timeout_call, 1800, self._search_datamart, [query_index])
+                        # search on wikidata, the q nodes columns are given directly instead of changing
+                        # self.q_nodes_columns because other searches may be running at the same time
+                        wikidata_future = executor.submit(timeout_call, 1800, self._search_wikidata,
+                                                          [None, return_df], {"q_nodes_columns": [-1]})
+                    # timeout_call returns None if timeout
+                    pair_search_results = list(datamart_future.result() or [])
+                    pair_search_results.extend(wikidata_future.result() or [])
+
+                    # the scores are scaled by the coverage of the pair which the results come from
+                    for each_result in pair_search_results:
+                        new_score = each_result.score() * coverage_score
+                        # change metadata's score
+                        each_result.metadata_manager.score = new_score
+                        # change score in datamart_search_result
+                        each_search_result = each_result.search_result
+                        if "score" in each_search_result:
+                            each_search_result["score"]["value"] = new_score
+                    search_results.extend(pair_search_results)
+
+        search_results.sort(key=methodcaller("score"), reverse=True)
 
         self._logger.debug("Running search on geospatial data finished.")
         return search_results
 
+    def _find_time_columns(self) -> typing.List[dict]:
+        """
+        Inner function used to find the time columns of supplied data with their granularity and time ranges, the
+        results are cached because it is needed by every general search query when augment with time
+        :return: a list of dict with granularity, start time, end time and column number of each time column
+        """
+        column_metadata = self._column_metadata()
+        if self._time_columns_cache is not None and self._time_columns_cache[0] is column_metadata:
+            return self._time_columns_cache[1]
+
+        column_names = self.supplied_dataframe.columns
+        # get time ranges on supplied data
+        time_columns_left = list()
+        for i, each_column_metadata in enumerate(column_metadata):
+            if "semantic_types" not in each_column_metadata:
+                self._logger.warning("column No.{} {} do not have semantic type on metadata!".
+                                     format(str(i), str(column_names[i])))
+
+        # only the columns with time semantic type are checked
+        for i in self._columns_by_semtype().get(TIME_SEMANTIC_TYPE, []):
+            each_column_metadata = column_metadata[i]
+            # if we got original time granularity from metadata, use it directly
+            time_column = self.supplied_dataframe.iloc[:, i]
+            if 'time_granularity' in each_column_metadata.keys():
+                granularity_d3m_format = each_column_metadata['time_granularity']
+                granularity = Utils.map_d3m_granularity_to_value(granularity_d3m_format['unit'])
+            else:
+                try:
+                    granularity_datamart_format = Utils.get_time_granularity(time_column)
+                    granularity = Utils.map_granularity_to_value(granularity_datamart_format)
+                except ValueError:
+                    self._logger.error("Can't continue because unable to get the time granularity on column No.{} {}".
+                                       format(str(i), str(column_names[i])))
+                    continue
+                self._logger.info("Get the time granularity of column No.{} {} as {}".
+                                  format(str(i), str(column_names[i]), str(granularity)))
+            if "datetime" not in time_column.dtype.name:
+                time_column = pd.to_datetime(time_column)
+            time_columns_left.append({
+                "granularity": granularity,
+                "start_time": min(time_column),
+                "end_time": max(time_column),
+                "column_number": i,
+            })
+        self._time_columns_cache = (column_metadata, time_columns_left)
+        return time_columns_left
+
     def _search_with_time_columns(self, search_results: typing.List["DatamartSearchResult"]) \
             -> typing.List["DatamartSearchResult"]:
         """
@@ -668,111 +954,88 @@ class DatamartQueryCursor(object):
         :return:
         """
         # find time columns first
-        # get time ranges on supplied data
-        time_columns_left = list()
-        for i in range(self.supplied_dataframe.shape[1]):
-            if type(self.supplied_data) is d3m_Dataset:
-                each_selector = (self.res_id, ALL_ELEMENTS, i)
-            else:
-                each_selector = (ALL_ELEMENTS, i)
-            each_column_metadata = self.supplied_data.metadata.query(each_selector)
-            if "semantic_types" not in each_column_metadata:
-                self._logger.warning("column No.{} {} do not have semantic type on metadata!".
-                                     format(str(i), str(self.supplied_dataframe.columns[i])))
-                continue
-
-            if TIME_SEMANTIC_TYPE in each_column_metadata['semantic_types']:
-                # if we got original time granularity from metadata, use it directly
-                time_column = self.supplied_dataframe.iloc[:, i]
-                if 'time_granularity' in each_column_metadata.keys():
-                    granularity_d3m_format = each_column_metadata['time_granularity']
-                    granularity = Utils.map_d3m_granularity_to_value(granularity_d3m_format['unit'])
-                else:
-                    try:
-                        granularity_datamart_format = Utils.get_time_granularity(time_column)
-                        granularity = Utils.map_granularity_to_value(granularity_datamart_format)
-                    except ValueError:
-                        self._logger.error("Can't continue because unable to get the time granularity on column No.{} {}".
-                                           format(str(i), str(self.supplied_dataframe.columns[i])))
-                        continue
-                    self._logger.info("Get the time granularity of column No.{} {} as {}".
-                                      format(str(i), str(self.supplied_dataframe.columns[i]), str(granularity)))
-                if "datetime" not in time_column.dtype.name:
-                    time_column = pd.to_datetime(time_column)
-                time_columns_left.append({
-                    "granularity": granularity,
-                    "start_time": min(time_column),
-                    "end_time": max(time_column),
-                    "column_number": i,
-                })
+        time_columns_left = self._find_time_columns()
 
         # get time ranges on search results
-        time_columns_right = list()
+        time_columns_right_candidates = list()
         for each_search_result in search_results:
             if each_search_result.search_type == "general":
                 for i in range(each_search_result.d3m_metadata.query((ALL_ELEMENTS,))['dimension']['length']):
                     each_column_metadata = each_search_result.d3m_metadata.query((ALL_ELEMENTS, i))
                     # TODO: it seems our current system can't handle multiple time data's condition
                     if TIME_SEMANTIC_TYPE in each_column_metadata['semantic_types']:
-                        time_information_query = self.augmenter.get_dataset_time_information(each_search_result.id())
-                        if len(time_information_query) == 0:
-                            self._logger.warning("Detect timestamp on dataset {} {} but no time information was found!"
-                                                 .format(each_search_result.id(),
-                                                         each_search_result.search_result['title']['value']))
-                            continue
-
-                        time_columns_right.append({
-                            "granularity": int(time_information_query[0]['time_granularity']['value']),
-                            "start_time": pd.Timestamp(time_information_query[0]['start_time']['value']),
-                            "end_time": pd.Timestamp(time_information_query[0]['end_time']['value']),
-                            "column_number": i,
-                            "dataset_id": each_search_result.id()
-                        })
+                        time_columns_right_candidates.append((each_search_result, i))
+
+        # query the time information of all candidate datasets together
+        candidate_dataset_ids = list(dict.fromkeys(each_search_result.id()
+                                                   for each_search_result, _ in time_columns_right_candidates))
+        datasets_time_information = self.augmenter.get_datasets_time_information(candidate_dataset_ids)
+
+        time_columns_right = list()
+        for each_search_result, i in time_columns_right_candidates:
+            time_information_query = datasets_time_information.get(each_search_result.id(), [])
+            if len(time_information_query) == 0:
+                self._logger.warning("Detect timestamp on dataset {} {} but no time information was found!"
+                                     .format(each_search_result.id(),
+                                             each_search_result.search_result['title']['value']))
+                continue
+
+            time_columns_right.append({
+                "granularity": int(time_information_query[0]['time_granularity']['value']),
+                "start_time": pd.Timestamp(time_information_query[0]['start_time']['value']),
+                "end_time": pd.Timestamp(time_information_query[0]['end_time']['value']),
+                "column_number": i,
+                "dataset_id": each_search_result.id()
+            })
 
         # only keep the datasets that has overlaped time range and same time granularity
         can_consider_datasets = defaultdict(list)
-        for left_time_info in time_columns_left:
-            for right_time_info in time_columns_right:
-                left_range = [left_time_info['start_time'], left_time_info['end_time']]
-                right_range = [right_time_info['start_time'], right_time_info['end_time']]
-                # ensure the format are correct
-                for i in range(len(left_range)):
-                    if isinstance(left_range[i], pd.Timestamp):
-                        left_range[i] = left_range[i].tz_localize('UTC')
-                    elif isinstance(left_range[i], str):
-                        left_range[i] = pd.Timestamp(left_range[i])
-
-                # TODO: if time granularity different but time range overlap? should we consider it or not
-                if left_time_info['granularity'] >= right_time_info['granularity'] and Utils.overlap(left_range, right_range):
-                    can_consider_datasets[right_time_info['dataset_id']].append(
-                        {
-                            "left_column_number": left_time_info["column_number"],
-                            "right_dataset_id": right_time_info['dataset_id'],
-                            "right_join_column_number": right_time_info['column_number'],
-                            "right_join_start_time": right_time_info['start_time'],
-                            "right_join_end_time": right_time_info['end_time'],
-                            "right_join_time_granularity": right_time_info['granularity']
-                        })
+        if len(time_columns_left) > 0 and len(time_columns_right) > 0:
+            # compare all pairs at once on the nanoseconds since epoch in UTC, times without time zone are seen as UTC
+            left_start = np.array([pd.Timestamp(each['start_time']).value for each in time_columns_left], dtype=np.int64)
+            left_end = np.array([pd.Timestamp(each['end_time']).value for each in time_columns_left], dtype=np.int64)
+            left_granularity = np.array([each['granularity'] for each in time_columns_left])
+            right_start = np.array([each['start_time'].value for each in time_columns_right], dtype=np.int64)
+            right_end = np.array([each['end_time'].value for each in time_columns_right], dtype=np.int64)
+            right_granularity = np.array([each['granularity'] for each in time_columns_right])
+
+            # TODO: if time granularity different but time range overlap? should we consider it or not
+            can_join = (left_granularity[:, None] >= right_granularity[None, :]) \
+                & (left_start[:, None] <= right_end[None, :]) & (right_start[None, :] <= left_end[:, None])
+            for left_i, right_i in np.argwhere(can_join).tolist():
+                left_time_info = time_columns_left[left_i]
+                right_time_info = time_columns_right[right_i]
+                can_consider_datasets[right_time_info['dataset_id']].append(
+                    {
+                        "left_column_number": left_time_info["column_number"],
+                        "right_dataset_id": right_time_info['dataset_id'],
+                        "right_join_column_number": right_time_info['column_number'],
+                        "right_join_start_time": right_time_info['start_time'],
+                        "right_join_end_time": right_time_info['end_time'],
+                        "right_join_time_granularity": right_time_info['granularity']
+                    })
 
         filtered_search_result = []
         for each_search_result in search_results:
             if each_search_result.search_type == "general":
                 if each_search_result.id() in can_consider_datasets:
+                    # the join columns are the same for all combines of this search result, find them only once
+                    right_index = None
+                    right_join_column_name = each_search_result.search_result['variableName']['value']
+                    for i in range(each_search_result.d3m_metadata.query((ALL_ELEMENTS,))['dimension']['length']):
+                        each_column_metadata = each_search_result.d3m_metadata.query((ALL_ELEMENTS, i))
+                        if each_column_metadata['name'] == right_join_column_name:
+                            right_index = i
+                            break
+
+                    if len(each_search_result.query_json['variables'].keys()) > 1:
+                        self._logger.warning("Mutiple variables join results update for time related not supported yet!")
+                    left_join_column_name = next(iter(each_search_result.query_json['variables']))
+                    left_index = self._column_name_to_index[left_join_column_name]
+
                     for each_combine in can_consider_datasets[each_search_result.id()]:
-                        each_search_result_copied = copy.copy(each_search_result)
+                        each_search_result_copied = each_search_result.clone_shallow()
                         # update join pairs information
-                        right_index = None
-                        right_join_column_name = each_search_result.search_result['variableName']['value']
-                        for i in range(each_search_result.d3m_metadata.query((ALL_ELEMENTS,))['dimension']['length']):
-                            each_column_metadata = each_search_result.d3m_metadata.query((ALL_ELEMENTS, i))
-                            if each_column_metadata['name'] == right_join_column_name:
-                                right_index = i
-                                break
-
-                        if len(each_search_result.query_json['variables'].keys()) > 1:
-                            self._logger.warning("Mutiple variables join results update for time related not supported yet!")
-                        left_join_column_name = list(each_search_result.query_json['variables'].keys())[0]
-                        left_index = self.supplied_dataframe.columns.tolist().index(left_join_column_name)
                         # right_index = right_df.columns.tolist().index(right_join_column_name)
                         original_left_index_column = DatasetColumn(resource_id=self.res_id, column_index=left_index)
                         original_right_index_column = DatasetColumn(resource_id=None, column_index=right_index)
@@ -805,7 +1068,7 @@ class Datamart(object):
     """
 
     def __init__(self, connection_url: str = None) -> None:
-        self._logger = logging.getLogger(__name__)
+        self._logger = _logger
         if connection_url:
             self._logger.info("Using user-defined connection url as " + connection_url)
             self.connection_url = connection_url
@@ -816,6 +1079,23 @@ class Datamart(object):
         self._logger.debug("Current datamart connection url is: " + self.connection_url)
         self.augmenter = Augment()
         self.supplied_dataframe = None
+        # (supplied data, its metadata, result) of last checking real metadata, reused when search on same data again
+        self._real_metadata_cache = None
+
+    def _check_and_get_dataset_real_metadata(self, supplied_data: d3m_Dataset) -> typing.Tuple[bool, d3m_Dataset]:
+        """
+        Inner function used to call MetadataCache.check_and_get_dataset_real_metadata, the result of last call is kept
+        so that searching repeatedly on the same supplied data do not need to hash the data and check the disk again
+        :param supplied_data: a Dataset format supplied data
+        :return: same as MetadataCache.check_and_get_dataset_real_metadata
+        """
+        cache = self._real_metadata_cache
+        if cache is not None and cache[0] is supplied_data and cache[1] is supplied_data.metadata:
+            return cache[2]
+        updated_result = MetadataCache.check_and_get_dataset_real_metadata(supplied_data)
+        # the metadata is updated in place if found, so keep the updated one to check next time
+        self._real_metadata_cache = (supplied_data, supplied_data.metadata, updated_result)
+        return updated_result
 
     def search(self, query: 'DatamartQuery') -> DatamartQueryCursor:
         """This entry point supports search using a query specification.
@@ -878,8 +1158,7 @@ class Datamart(object):
         if query.keywords:
             query_keywords = []
             for each in query.keywords:
-                translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-                words_processed = str(each).lower().translate(translator).split()
+                words_processed = str(each).lower().translate(PUNCTUATION_TRANSLATOR).split()
                 query_keywords.extend(words_processed)
         else:
             query_keywords = None
@@ -902,7 +1181,7 @@ class Datamart(object):
                               DatamartQuery(search_type="geospatial")]
 
         # try to update with more correct metadata if possible
-        updated_result = MetadataCache.check_and_get_dataset_real_metadata(supplied_data)
+        updated_result = self._check_and_get_dataset_real_metadata(supplied_data)
         if updated_result[0]:  # [0] store whether it success find the metadata
             supplied_data = updated_result[1]
 
@@ -921,15 +1200,11 @@ class Datamart(object):
                 selector = (ALL_ELEMENTS, each)
             each_column_meta = supplied_data.metadata.query(selector)
             # try to parse each column to DateTime type. If success, add new semantic type, otherwise do nothing
-            try:
-                pd.to_datetime(self.supplied_dataframe.iloc[:, each])
+            if Utils.is_datetime_column(self.supplied_dataframe.iloc[:, each]):
                 new_semantic_type = {"semantic_types": (TIME_SEMANTIC_TYPE, ATTRIBUTE_SEMANTIC_TYPE)}
                 supplied_data.metadata = supplied_data.metadata.update(selector, new_semantic_type)
-            except:
-                pass
 
-            if TEXT_SEMANTIC_TYPE in each_column_meta["semantic_types"] \
-                    or TIME_SEMANTIC_TYPE in each_column_meta["semantic_types"]:
+            if not QUERY_COLUMN_SEMANTIC_TYPES.isdisjoint(each_column_meta["semantic_types"]):
                 can_query_columns.append(each)
 
         if len(can_query_columns) == 0:
@@ -982,7 +1257,7 @@ class Datamart(object):
         # put entities of all given columns from "data_constraints" into the query's variable part and run the query
 
         # try to update with more correct metadata if possible
-        updated_result = MetadataCache.check_and_get_dataset_real_metadata(supplied_data)
+        updated_result = self._check_and_get_dataset_real_metadata(supplied_data)
         if updated_result[0]:  # [0] store whether it success find the metadata
             supplied_data = updated_result[1]
 
@@ -1001,14 +1276,13 @@ class Datamart(object):
         """
         all_query_variables = []
         keywords = []
-        translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
 
         for each_constraint in data_constraints:
             for each_column in each_constraint.columns:
                 each_column_index = each_column.column_index
                 each_column_res_id = each_column.resource_id
-                all_value_str_set = set()
                 each_column_meta = supplied_data.metadata.query((each_column_res_id, ALL_ELEMENTS, each_column_index))
+                each_column_name = supplied_data[each_column_res_id].columns[each_column_index]
                 treat_as_a_text_column = False
                 if TIME_SEMANTIC_TYPE in each_column_meta["semantic_types"]:
                     try:
@@ -1019,7 +1293,7 @@ class Datamart(object):
                         time_granularity = Utils.get_time_granularity(column_data_datetime_format)
                         # for time type, we create a special type of keyword and variables
                         # so that we can detect it later in general search part
-                        each_keyword = TIME_COLUMN_MARK + "____" + supplied_data[each_column_res_id].columns[each_column_index]
+                        each_keyword = TIME_COLUMN_MARK + "____" + each_column_name
                         keywords.append(each_keyword)
                         all_value_str = str(start_date) + "____" + str(end_date) + "____" + time_granularity
                         all_query_variables.append(VariableConstraint(key=each_keyword, values=all_value_str))
@@ -1027,26 +1301,30 @@ class Datamart(object):
                     except Exception as e:
                         self._logger.debug(e, exc_info=True)
                         self._logger.error("Can't parse current datetime for column No." + str(each_column_index)
-                                           + " with column name " + supplied_data[each_column_res_id].columns[each_column_index])
+                                           + " with column name " + each_column_name)
                         treat_as_a_text_column = True
 
                 # for some special condition (DA_medical_malpractice), a column could have a DateTime tag but unable to be parsed
                 # in such condition, we should search and treat it as a Text column then
                 if 'http://schema.org/Text' in each_column_meta["semantic_types"] or treat_as_a_text_column:
-                    column_values = supplied_data[each_column_res_id].iloc[:, each_column_index].astype(str)
-                    query_column_entities = list(set(column_values.tolist()))
-                    random.seed(42)  # ensure always get the same random number
+                    column_values = supplied_data[each_column_res_id].iloc[:, each_column_index]
+                    # sample the rows first so that we do not need to hash all values of a long column
+                    random_state = np.random.RandomState(42)  # ensure always get the same random number
+                    sample_rows_amount = MAX_ENTITIES_LENGTH * ENTITIES_SAMPLE_ROWS_RATE
+                    if len(column_values) > sample_rows_amount:
+                        column_values = column_values.iloc[random_state.choice(len(column_values), sample_rows_amount,
+                                                                               replace=False)]
+                    query_column_entities = pd.unique(column_values.astype(str).values)
                     if len(query_column_entities) > MAX_ENTITIES_LENGTH:
-                        query_column_entities = random.sample(query_column_entities, MAX_ENTITIES_LENGTH)
-                    for each in query_column_entities:
-                        words_processed = str(each).lower().translate(translator).split()
-                        for word in words_processed:
-                            all_value_str_set.add(word)
-                    all_value_str_list = list(all_value_str_set)
+                        query_column_entities = random_state.choice(query_column_entities, MAX_ENTITIES_LENGTH,
+                                                                    replace=False)
+                    # split the values into words with pandas string methods instead of one by one
+                    all_value_str_list = pd.Series(query_column_entities, dtype=object).str.lower() \
+                        .str.translate(PUNCTUATION_TRANSLATOR).str.split().explode().dropna().unique().tolist()
                     # ensure the order we get are always same
                     all_value_str_list.sort()
                     all_value_str = " ".join(all_value_str_list)
-                    each_keyword = supplied_data[each_column_res_id].columns[each_column_index]
+                    each_keyword = each_column_name
                     keywords.append(each_keyword)
 
                     all_query_variables.append(VariableConstraint(key=each_keyword, values=all_value_str))
@@ -1075,7 +1353,7 @@ class DatamartSearchResult:
     def __init__(self, search_result: dict,
                  supplied_data: typing.Union[d3m_DataFrame, d3m_Dataset, None],
                  query_json: dict, search_type: str, connection_url: str = None):
-        self._logger = logging.getLogger(__name__)
+        self._logger = _logger
         self.search_result = search_result
         self.supplied_data = supplied_data
         if type(supplied_data) is d3m_Dataset:
@@ -1104,10 +1382,20 @@ class DatamartSearchResult:
         self.pairs = None
         self.join_pairs = None
         self.right_df = None
+        # the key of the search result and wikifier choice that self.right_df is materialized with
+        self._right_df_key = None
+        # the result of _get_wikidata_query_parts, it does not change unless the P nodes needed changed
+        self._wikidata_query_parts_cache = None
+        # the result of _get_p_node_names, it does not change unless the d3m metadata changed
+        self._p_node_names_cache = None
+        # the result of _get_pairs_ids, it does not change unless the pairs found changed
+        self._pairs_ids_cache = None
+        # the parsed extra information, it can be large (e.g. the first 10 rows) so it is only parsed once here
+        self._extra_information = None
         extra_information = self.search_result.get('extra_information')
         if extra_information is not None:
-            extra_information = json.loads(extra_information['value'])
-            self.special_requirement = extra_information.get("special_requirement")
+            self._extra_information = json_utils.loads(extra_information['value'])
+            self.special_requirement = self._extra_information.get("special_requirement")
         else:
             self.special_requirement = None
         self.metadata_manager = MetadataGenerator(supplied_data=self.supplied_data, search_result=self.search_result,
@@ -1115,6 +1403,19 @@ class DatamartSearchResult:
                                                   wikidata_cache_manager=self.wikidata_cache_manager)
         self.d3m_metadata = self.metadata_manager.generate_d3m_metadata_for_search_result()
 
+    def clone_shallow(self) -> "DatamartSearchResult":
+        """
+        Function used to get a cheap copy of this search result without running __init__ again, all attributes are
+        shared with the original one except the query json keywords and the search result which will be updated
+        :return: a new DatamartSearchResult
+        """
+        new_search_result = object.__new__(type(self))
+        new_search_result.__dict__.update(self.__dict__)
+        new_search_result.query_json = dict(self.query_json)
+        new_search_result.query_json['keywords'] = list(self.query_json['keywords'])
+        new_search_result.search_result = dict(self.search_result)
+        return new_search_result
+
     def _get_first_ten_rows(self) -> pd.DataFrame:
         """
         Inner function used to get first 10 rows of the search results
@@ -1123,7 +1424,7 @@ class DatamartSearchResult:
         return_res = ""
         try:
             if self.search_type == "general":
-                return_res = json.loads(self.search_result['extra_information']['value'])['first_10_rows']
+                return_res = self._extra_information['first_10_rows']
 
             elif self.search_type == "wikidata":
                 materialize_info = self.search_result
@@ -1190,6 +1491,9 @@ class DatamartSearchResult:
                 self.metadata_manager = MetadataGenerator(supplied_data=supplied_data, search_result=self.search_result,
                                                           search_type=self.search_type, connection_url=connection_url,
                                                           wikidata_cache_manager=self.wikidata_cache_manager)
+                # the data downloaded from previous connection should not be used any more
+                self.right_df = None
+                self._right_df_key = None
                 self._logger.info("New connection url given from download part as " + self.connection_url)
 
         if type(supplied_data) is d3m_Dataset:
@@ -1212,7 +1516,7 @@ class DatamartSearchResult:
             raise ValueError("Unknown search type with " + self.search_type)
 
         # sometime the index will be not continuous after augment, need to reset to ensure the index is continuous
-        res.reset_index(drop=True)
+        res.reset_index(drop=True, inplace=True)
 
         if return_format == "ds":
             return_df = d3m_DataFrame(res, generate_metadata=False)
@@ -1235,13 +1539,15 @@ class DatamartSearchResult:
         """
         self._logger.debug("Start downloading for datamart...")
 
-        join_pairs_result = []
-        candidate_join_column_scores = []
-
-        # start finding pairs
-        left_df = copy.deepcopy(self.supplied_dataframe)
-        if self.right_df is None:
+        # start finding pairs, the supplied data is never changed here so a shallow copy is enough, the time join
+        # columns formatted below are kept aside and only put into the join columns given to the joiner
+        left_df = self.supplied_dataframe.copy(deep=False)
+        formatted_left_columns = dict()
+        # the downloaded data is only reused if it is materialized from the same search result with same wikifier choice
+        right_df_key = get_str_hash(json_utils.dumps_canonical(self.search_result) + str(run_wikifier))
+        if self.right_df is None or self._right_df_key != right_df_key:
             self.right_df = MaterializerCache.materialize(metadata=self.search_result, run_wikifier=run_wikifier)
+            self._right_df_key = right_df_key
             right_df = self.right_df
         else:
             self._logger.info("Find downloaded data from previous time, will use that.")
@@ -1286,86 +1592,102 @@ class DatamartSearchResult:
                 right_df[right_join_column_name] = pd.to_datetime(right_df[right_join_column_name])
             else:
                 join_pairs_numbers = self.join_pairs[0].get_column_number_pairs()
-                time_stringfy_format = Utils.time_granularity_value_to_stringfy_time_format(time_granularity)
-                if time_granularity == 8:
-                    possible_granularity = {}
+                # parse each join column only once, the parsed values are used for the final formatting
+                parsed_time_columns = dict()
                 for each_join_pair_left, each_join_pair_right in join_pairs_numbers:
-                    for each_col in each_join_pair_left:
-                        try:
-                            left_df.iloc[:, each_col] = pd.to_datetime(left_df.iloc[:, each_col]) \
-                                .dt.strftime(time_stringfy_format)
-                            if time_granularity == 8:
-                                possible_granularity[("left", each_col)] = \
-                                    Utils.map_d3m_granularity_to_value(Utils.get_time_granularity(left_df.iloc[:, each_col]))
-                        except:
-                            self._logger.warning("Column No.{} {} on left_df(supplied_data) is not time column!".format(
-                                str(each_col), left_df.columns[each_col]))
-
-                    for each_col in each_join_pair_right:
-                        try:
-                            right_df.iloc[:, each_col] = pd.to_datetime(right_df.iloc[:, each_col]). \
-                                dt.strftime(time_stringfy_format)
-                            if time_granularity == 8:
-                                possible_granularity[("right", each_col)] = \
-                                    Utils.map_d3m_granularity_to_value(Utils.get_time_granularity(right_df.iloc[:, each_col]))
-                        except:
-                            self._logger.warning("Column No.{} {} on right_df is not time column!".format(
-                                str(each_col), right_df.columns[each_col]))
-
-                    # update with new time granularity
-                    if time_granularity == "8":
-                        time_granularity = min(possible_granularity.values())
-                        self._logger.info("Get new granularity value as {}".format(str(time_granularity)))
-                        time_stringfy_format = Utils.time_granularity_value_to_stringfy_time_format(time_granularity)
-                        for k, v in possible_granularity.keys():
-                            if k[0] == "left":
-                                left_df.iloc[:, k[1]] = pd.to_datetime(left_df.iloc[:, k[1]]). \
-                                    dt.strftime(time_stringfy_format)
-                            elif k[0] == "right":
-                                right_df.iloc[:, k[1]] = pd.to_datetime(right_df.iloc[:, k[1]]). \
-                                    dt.strftime(time_stringfy_format)
+                    for side, df, side_name, join_columns in (
+                            ("left", left_df, "left_df(supplied_data)", each_join_pair_left),
+                            ("right", right_df, "right_df", each_join_pair_right)):
+                        for each_col in join_columns:
+                            if (side, each_col) in parsed_time_columns:
+                                continue
+                            each_column = df.iloc[:, each_col]
+                            # numbers would be parsed as epoch timestamps, they are not time columns
+                            if each_column.dtype.kind in "biufc":
+                                self._logger.warning("Column No.{} {} on {} is not time column!".format(
+                                    str(each_col), df.columns[each_col], side_name))
+                                continue
+                            # the values can not be parsed are set to NaT instead of raising on each non time column,
+                            # the missing values are not counted
+                            each_parsed_column = pd.to_datetime(each_column, errors="coerce")
+                            values_amount = each_column.notna().sum()
+                            if values_amount == 0 or each_parsed_column.notna().sum() / values_amount \
+                                    < TIME_JOIN_COLUMN_MIN_PARSED_RATE:
+                                self._logger.warning("Column No.{} {} on {} is not time column!".format(
+                                    str(each_col), df.columns[each_col], side_name))
+                            else:
+                                parsed_time_columns[(side, each_col)] = each_parsed_column
 
-        pairs = candidate_join_column_pairs[0].get_column_number_pairs()
-        # generate the pairs for each join_column_pairs
-        for each_pair in pairs:
+                time_stringfy_format = Utils.time_granularity_value_to_stringfy_time_format(time_granularity)
+                for (side, each_col), each_parsed_column in parsed_time_columns.items():
+                    df = left_df if side == "left" else right_df
+                    # the values can not be parsed are kept as they are
+                    formatted_column = each_parsed_column.dt.strftime(time_stringfy_format) \
+                        .where(each_parsed_column.notna(), df.iloc[:, each_col])
+                    if side == "left":
+                        formatted_left_columns[each_col] = formatted_column
+                    else:
+                        right_df.iloc[:, each_col] = formatted_column
+
+        def find_pair(each_pair):
             left_columns = each_pair[0]
             right_columns = each_pair[1]
-            try:
-                # Only profile the joining columns, otherwise it will be too slow:
-                # left_metadata = Utils.calculate_dsbox_features(data=left_df, metadata=left_metadata,
-                #                                                selected_columns=set(left_columns))
-                #
-                # right_metadata = Utils.calculate_dsbox_features(data=right_df, metadata=right_metadata,
-                #                                                 selected_columns=set(right_columns))
-
-                self._logger.info(" - start getting pairs for " + str(each_pair))
-                right_df_copy = copy.deepcopy(right_df)
-
-                result, self.pairs = RLTKJoinerGeneral.find_pair(left_df=left_df, right_df=right_df_copy,
-                                                                 left_columns=[left_columns],
-                                                                 right_columns=[right_columns],
-                                                                 left_metadata=None,
-                                                                 right_metadata=None)
-
-                join_pairs_result.append(result)
-                # TODO: figure out some way to compute the joining quality
-                candidate_join_column_scores.append(1)
+            # Only profile the joining columns, otherwise it will be too slow:
+            # left_metadata = Utils.calculate_dsbox_features(data=left_df, metadata=left_metadata,
+            #                                                selected_columns=set(left_columns))
+            #
+            # right_metadata = Utils.calculate_dsbox_features(data=right_df, metadata=right_metadata,
+            #                                                 selected_columns=set(right_columns))
+
+            self._logger.info(" - start getting pairs for " + str(each_pair))
+            # the joiner only reads the join columns but builds the records with all columns, so only give it
+            # the join columns, the index is kept so the records ids are the same, the right one is copied
+            # because the joiner adds the joining pairs column to it
+            left_join_columns = sorted(set(left_columns))
+            right_join_columns = sorted(set(right_columns))
+            left_join_df = left_df.iloc[:, left_join_columns]
+            if any(each in formatted_left_columns for each in left_join_columns):
+                left_join_df = left_join_df.copy()
+                for each_position, each in enumerate(left_join_columns):
+                    if each in formatted_left_columns:
+                        left_join_df.iloc[:, each_position] = formatted_left_columns[each].values
+            join_result, pairs_list = RLTKJoinerGeneral.find_pair(left_df=left_join_df,
+                                                                  right_df=right_df.iloc[:, right_join_columns].copy(),
+                                                                  left_columns=[[left_join_columns.index(each)
+                                                                                 for each in left_columns]],
+                                                                  right_columns=[[right_join_columns.index(each)
+                                                                                  for each in right_columns]],
+                                                                  left_metadata=None,
+                                                                  right_metadata=None)
+
+            # then add the joining pairs column found to the whole right_df, a shallow copy is enough to keep
+            # the results of each pair and the downloaded data separated
+            result = right_df.copy(deep=False)
+            result["joining_pairs"] = join_result["joining_pairs"].values
+            return result, pairs_list
 
-            except Exception as e:
-                self._logger.error("failed when getting pairs for", each_pair)
-                self._logger.debug(e, exc_info=True)
+        pairs = candidate_join_column_pairs[0].get_column_number_pairs()
+        # generate the pairs for each join_column_pairs, they do not depend on each other so run them at the same time
+        with ThreadPoolExecutor(max_workers=max(1, min(len(pairs), DOWNLOAD_FIND_PAIR_WORKERS))) as executor:
+            futures = [executor.submit(find_pair, each_pair) for each_pair in pairs]
 
         # choose the best joining results
         all_results = []
-        for i in range(len(join_pairs_result)):
-            each_result = (pairs[i], candidate_join_column_scores[i], join_pairs_result[i])
-            all_results.append(each_result)
+        for each_pair, each_future in zip(pairs, futures):
+            try:
+                result, self.pairs = each_future.result()
+                # TODO: figure out some way to compute the joining quality
+                all_results.append((each_pair, 1, result))
+            except Exception as e:
+                self._logger.error("failed when getting pairs for " + str(each_pair))
+                self._logger.debug(e, exc_info=True)
 
         all_results.sort(key=lambda x: x[1], reverse=True)
         if len(all_results) == 0:
             raise ValueError("All join attempt failed!")
 
-        return_result = all_results[0][2]
+        # only the chosen result is copied, so that changing it will not change the downloaded data kept for next time
+        return_result = all_results[0][2].copy()
         self._logger.debug("download_general function finished.")
         return return_result
 
@@ -1398,6 +1720,50 @@ class DatamartSearchResult:
 
         return dummy_result
 
+    def _get_wikidata_query_parts(self) -> typing.Tuple[typing.List[str], str, str]:
+        """
+        Inner function used to get the parts of the wikidata download query which only depend on the P nodes needed,
+        they are cached so that downloading again only needs to build the Q nodes part
+        :return: the P nodes used in query, the part of the query before the Q nodes and the part after the Q nodes
+        """
+        p_nodes_needed = self.search_result["p_nodes_needed"]
+        p_nodes_needed.sort()
+        if self._wikidata_query_parts_cache is not None and self._wikidata_query_parts_cache[0] == p_nodes_needed:
+            return self._wikidata_query_parts_cache[1]
+
+        p_nodes_used = [each for each in p_nodes_needed if each not in P_NODE_IGNORE_LIST]
+        query_parts = {
+            "p_nodes_query_part": "".join([" ?" + each for each in p_nodes_used]),
+            "p_nodes_optional_part": "".join(["  OPTIONAL { ?q wdt:" + each + " ?" + each + "}\n"
+                                              for each in p_nodes_used]),
+            "special_request_part": "".join([SPECIAL_REQUEST_FOR_P_NODE[each] + "\n" for each in p_nodes_needed
+                                             if each in SPECIAL_REQUEST_FOR_P_NODE]),
+        }
+        # fill the template except the Q nodes, so the query of each chunk is only concatenating 3 parts
+        prefix_template, suffix_template = WIKIDATA_DOWNLOAD_QUERY_TEMPLATE.split("%(q_nodes_query)s")
+        result = (p_nodes_used, prefix_template % query_parts, suffix_template % query_parts)
+        self._wikidata_query_parts_cache = (list(p_nodes_needed), result)
+        return result
+
+    def _get_p_node_names(self) -> typing.Dict[str, str]:
+        """
+        Inner function used to get the real column names of the P nodes from the d3m metadata, it is cached so that
+        the columns metadata are not walked through again on each download
+        :return: a dict from the P node to the column name
+        """
+        if self._p_node_names_cache is not None and self._p_node_names_cache[0] is self.d3m_metadata:
+            return self._p_node_names_cache[1]
+
+        p_node_names = dict()
+        i = 0
+        while len(self.d3m_metadata.query((ALL_ELEMENTS, i)).keys()) != 0:
+            column_meta = self.d3m_metadata.query((ALL_ELEMENTS, i))
+            if "P_node" in column_meta:
+                p_node_names[column_meta['P_node']] = column_meta['name']
+            i += 1
+        self._p_node_names_cache = (self.d3m_metadata, p_node_names)
+        return p_node_names
+
     def _download_wikidata(self) -> pd.DataFrame:
         """
         :return: return_df: the materialized wikidata d3m_DataFrame,
@@ -1405,7 +1771,6 @@ class DatamartSearchResult:
         """
         self._logger.debug("Start downloading for wikidata...")
         # prepare the query
-        p_nodes_needed = self.search_result["p_nodes_needed"]
         target_q_node_column_name = self.search_result["target_q_node_column_name"]
 
         try:
@@ -1418,74 +1783,55 @@ class DatamartSearchResult:
         if not q_node_column_number:
             return self._dummy_download_wikidata()
 
-        q_nodes_list = set(self.supplied_dataframe.iloc[:, q_node_column_number].tolist())
-        q_nodes_list = list(q_nodes_list)
-        q_nodes_list.sort()
-        p_nodes_needed.sort()
-        q_nodes_query = ""
-        p_nodes_query_part = ""
-        p_nodes_optional_part = ""
-        special_request_part = ""
-
-        for each in q_nodes_list:
-            if each != "N/A":
-                q_nodes_query += "(wd:" + each + ") \n"
-        for each in p_nodes_needed:
-            if each not in P_NODE_IGNORE_LIST:
-                p_nodes_query_part += " ?" + each
-                p_nodes_optional_part += "  OPTIONAL { ?q wdt:" + each + " ?" + each + "}\n"
-            if each in SPECIAL_REQUEST_FOR_P_NODE:
-                special_request_part += SPECIAL_REQUEST_FOR_P_NODE[each] + "\n"
-
-        sparql_query = "SELECT DISTINCT ?q " + p_nodes_query_part + \
-                       " \nWHERE \n{\n  VALUES (?q) { \n " + q_nodes_query + "}\n" + \
-                       p_nodes_optional_part + special_request_part + "}\n"
-
-        results = self.wikidata_cache_manager.get_result(sparql_query)
-        return_df = d3m_DataFrame()
-
-        # if results is None, it means download failed, return blank dataFrame directly
-        if results is None:
+        # find the distinct Q nodes with pandas instead of building a python set from all rows
+        q_nodes_list = pd.unique(self.supplied_dataframe.iloc[:, q_node_column_number].dropna().values)
+        q_nodes_list = np.sort(q_nodes_list[q_nodes_list != "N/A"]).tolist()
+        p_nodes_used, query_prefix, query_suffix = self._get_wikidata_query_parts()
+
+        # the Q nodes are split into chunks so that each query will not be too big, and the chunks are queried
+        # at the same time, small columns still get only one query which is the same as before
+        sparql_queries = []
+        for i in range(0, max(len(q_nodes_list), 1), WIKIDATA_DOWNLOAD_CHUNK_SIZE):
+            # the parts are joined at once, adding them to the str one by one is quadratic on large Q nodes columns
+            q_nodes_query = "".join(["(wd:" + each + ") \n"
+                                     for each in q_nodes_list[i: i + WIKIDATA_DOWNLOAD_CHUNK_SIZE]])
+            sparql_queries.append(query_prefix + q_nodes_query + query_suffix)
+
+        with ThreadPoolExecutor(max_workers=min(8, len(sparql_queries))) as executor:
+            chunks_results = list(executor.map(self.wikidata_cache_manager.get_result, sparql_queries))
+
+        # if any results is None, it means download failed, return blank dataFrame directly
+        if any(results is None for results in chunks_results):
             # print 3 times to ensure easy to find
             self._logger.error("Download failed!!!")
             self._logger.error("Download failed!!!")
             self._logger.error("Download failed!!!")
-            return return_df
-
-        q_node_name_appeared = set()
-        for result in results:
-            each_result = {}
-            q_node_name = result.pop("q")["value"].split("/")[-1]
-            if q_node_name in q_node_name_appeared:
-                continue
-            q_node_name_appeared.add(q_node_name)
-            each_result["q_node"] = q_node_name
-            for p_name, p_val in result.items():
-                each_result[p_name] = p_val["value"]
-            return_df = return_df.append(each_result, ignore_index=True)
-
-        column_name_update = dict()
-
-        # for some special condition, we may meet this, and we need to ensure q_node column is the last column
-        if return_df.columns[-1] != "q_node":
-            cols = return_df.columns.tolist()
-            cols.append(cols.pop(cols.index("q_node")))
-            return_df = return_df[cols]
+            return d3m_DataFrame()
+
+        # the columns are known from the query, so collect the values of each column first and build the dataframe
+        # at once, appending the rows one by one is quadratic, the q_node column needs to be the last column
+        columns = p_nodes_used + ["q_node"]
+        all_results = [result for results in chunks_results for result in results]
+        columns_values = dict()
+        for each in p_nodes_used:
+            # the properties not found are not in the results
+            columns_values[each] = [result[each]["value"] if each in result else None for result in all_results]
+        # get the Q node names from their uris on the whole column at once
+        columns_values["q_node"] = pd.Series([result["q"]["value"] for result in all_results],
+                                             dtype=object).str.rsplit("/", n=1).str[-1]
+        wikidata_df = pd.DataFrame(columns_values, columns=columns)
+        # only keep the first result of each Q node
+        wikidata_df = wikidata_df[~wikidata_df["q_node"].duplicated(keep="first")].reset_index(drop=True)
+        return_df = d3m_DataFrame(wikidata_df)
 
         # rename the columns from P node value to real name
-        i = 0
-        while len(self.d3m_metadata.query((ALL_ELEMENTS, i)).keys()) != 0:
-            column_meta = self.d3m_metadata.query((ALL_ELEMENTS, i))
-            if "P_node" in column_meta:
-                column_name_update[column_meta['P_node']] = column_meta['name']
-            i += 1
-
-        return_df = return_df.rename(columns=column_name_update)
+        return_df = return_df.rename(columns=self._get_p_node_names())
 
         # use rltk joiner to find the joining pairs
         joiner = RLTKJoinerWikidata()
         joiner.set_join_target_column_names((self.supplied_dataframe.columns[q_node_column_number], "q_node"))
-        result, self.pairs = joiner.find_pair(left_df=self.supplied_dataframe, right_df=return_df)
+        # the joiner adds the id column to the left one, a shallow copy is enough to keep the supplied data unchanged
+        result, self.pairs = joiner.find_pair(left_df=self.supplied_dataframe.copy(deep=False), right_df=return_df)
 
         self._logger.debug("download_wikidata function finished.")
         return result
@@ -1503,9 +1849,7 @@ class DatamartSearchResult:
         except ValueError:
             raise ValueError("Could not find corresponding q node column for " + target_q_node_column_name +
                              ". Maybe use the wrong search results?")
-        q_nodes_list = set(self.supplied_dataframe.iloc[:, q_node_column_number].tolist())
-        q_nodes_list = list(q_nodes_list)
-        q_nodes_list.sort()
+        q_nodes_list = np.sort(pd.unique(self.supplied_dataframe.iloc[:, q_node_column_number].dropna().values)).tolist()
 
         return_df = DownloadManager.fetch_fb_embeddings(q_nodes_list, target_q_node_column_name)
         return_df = d3m_DataFrame(return_df)
@@ -1513,7 +1857,8 @@ class DatamartSearchResult:
         # use rltk joiner to find the joining pairs
         joiner = RLTKJoinerWikidata()
         joiner.set_join_target_column_names((self.supplied_dataframe.columns[q_node_column_number], "q_node"))
-        result, self.pairs = joiner.find_pair(left_df=self.supplied_dataframe, right_df=return_df)
+        # the joiner adds the id column to the left one, a shallow copy is enough to keep the supplied data unchanged
+        result, self.pairs = joiner.find_pair(left_df=self.supplied_dataframe.copy(deep=False), right_df=return_df)
 
         self._logger.debug("download_vector function finished.")
         return result
@@ -1562,7 +1907,7 @@ class DatamartSearchResult:
         if use_cache is None:
             use_cache = config.use_cache
 
-        if type(supplied_data) is d3m_Dataset:
+        if isinstance(supplied_data, d3m_Dataset):
             # try to update with more correct metadata if possible
             updated_result = MetadataCache.check_and_get_dataset_real_metadata(supplied_data)
             if updated_result[0]:  # [0] store whether it success find the metadata
@@ -1587,8 +1932,13 @@ class DatamartSearchResult:
 
         if use_cache:
             try:
+                # both are needed again to push the results, so only compute them once
+                search_result_serialized = self.serialize()
+                supplied_dataframe_hash = self.general_search_cache_manager.get_supplied_dataframe_hash(
+                    supplied_dataframe_original)
                 cache_key = self.general_search_cache_manager.get_hash_key(supplied_dataframe=supplied_dataframe_original,
-                                                                           search_result_serialized=self.serialize())
+                                                                           search_result_serialized=search_result_serialized,
+                                                                           supplied_dataframe_hash=supplied_dataframe_hash)
 
                 cache_result = self.general_search_cache_manager.get_cache_results(cache_key)
                 if cache_result is not None:
@@ -1615,23 +1965,24 @@ class DatamartSearchResult:
                 # res = self._run_wikifier(supplied_data)
 
             else:
-                if type(supplied_data) is d3m_DataFrame:
-                    res = timeout_call(1800, self._augment, [supplied_data, augment_columns, True, "df", augment_resource_id])
-
-                    # res = self._augment(supplied_data=supplied_data, augment_columns=augment_columns, generate_metadata=True,
-                    #                     return_format="df", augment_resource_id=augment_resource_id)
-                elif type(supplied_data) is d3m_Dataset:
-                    res = timeout_call(1800, self._augment, [supplied_data, augment_columns, True, "ds", augment_resource_id])
-                    # res = self._augment(supplied_data=supplied_data, augment_columns=augment_columns, generate_metadata=True,
-                    #                     return_format="ds", augment_resource_id=augment_resource_id)
-                else:
+                return_format = None
+                for each_type, each_format in AUGMENT_RETURN_FORMATS:
+                    if isinstance(supplied_data, each_type):
+                        return_format = each_format
+                        break
+                if return_format is None:
                     raise ValueError("Unknown input type for supplied data as: " + str(type(supplied_data)))
+                res = timeout_call(1800, self._augment, [supplied_data, augment_columns, True, return_format,
+                                                         augment_resource_id])
+                # res = self._augment(supplied_data=supplied_data, augment_columns=augment_columns, generate_metadata=True,
+                #                     return_format=return_format, augment_resource_id=augment_resource_id)
 
             if res is not None:
                 # sometime the index will be not continuous after augment, need to reset to ensure the index is continuous
-                res[augment_resource_id].reset_index(drop=True)
-                res[augment_resource_id].fillna('', inplace=True)
-                res[augment_resource_id] = res[augment_resource_id].astype(str)
+                augment_df = res[augment_resource_id]
+                augment_df.reset_index(drop=True, inplace=True)
+                # fillna returns a new frame which is then converted, instead of filling the values in place first
+                res[augment_resource_id] = augment_df.fillna('').astype(str)
             else:
                 res = "failed because nothing returned, maybe because timeout?"
 
@@ -1646,9 +1997,10 @@ class DatamartSearchResult:
         if use_cache and cache_key and self.search_type != "wikifier":
             # FIXME: should we cache failed results here?
             response = self.general_search_cache_manager.add_to_memcache(supplied_dataframe=supplied_dataframe_original,
-                                                                         search_result_serialized=self.serialize(),
+                                                                         search_result_serialized=search_result_serialized,
                                                                          augment_results=res,
-                                                                         hash_key=cache_key
+                                                                         hash_key=cache_key,
+                                                                         supplied_dataframe_hash=supplied_dataframe_hash
                                                                          )
             # save the augmented result's metadata if second augment is conducted
             if type(res) is not string:
@@ -1656,7 +2008,7 @@ class DatamartSearchResult:
             if not response:
                 self._logger.warning("Push augment results to results failed!")
             else:
-                self._logger.info("Push augment results to memcache success!")
+                self._logger.info("Push augment results to memcache success! The result files are written in background.")
 
         # updated v2019.10.30, now raise the error instead of return the error
         if type(res) is string:
@@ -1672,12 +2024,13 @@ class DatamartSearchResult:
         if type(return_format) is not str or return_format != "ds" and return_format != "df":
             raise ValueError("Unknown return format as" + str(return_format))
 
+        # the supplied data is not changed by downloading and joining, so no copy is needed
         if type(supplied_data) is d3m_Dataset:
-            supplied_data_df = copy.copy(supplied_data[self.res_id])
+            supplied_data_df = supplied_data[self.res_id]
         elif type(supplied_data) is d3m_DataFrame:
-            supplied_data_df = copy.copy(supplied_data)
+            supplied_data_df = supplied_data
         else:
-            supplied_data_df = copy.copy(self.supplied_dataframe)
+            supplied_data_df = self.supplied_dataframe
 
         if supplied_data_df is None:
             raise ValueError("Can't find supplied data!")
@@ -1689,30 +2042,24 @@ class DatamartSearchResult:
         left_pairs_oversize = False
         right_pairs_oversize = False
         start = time.time()
+        # the row ids of the pairs on both sides, used for both the duplicate checking and joining
+        pairs_left_ids, pairs_right_ids = self._get_pairs_ids()
 
         # only need to check duplicate for general search's join
         if self.search_type == "general":
             maximum_accept_duplicate_amount = self.supplied_dataframe.shape[0] / 20
             self._logger.info("Maximum accept duplicate amount is: " + str(maximum_accept_duplicate_amount))
-            for each_row in join_pair_column:
-                if len(each_row) >= maximum_accept_duplicate_amount:
+            if len(join_pair_column) > 0:
+                most_join_pairs = join_pair_column.map(len).max()
+                if most_join_pairs >= maximum_accept_duplicate_amount:
                     raise ValueError(
-                        "Too much available join columns ({}) for pair {}".format(str(len(each_row)), self.join_pairs))
-
-            left_pairs = defaultdict(list)
-            right_pairs = defaultdict(list)
-
-            for r1, r2 in self.pairs:
-                if left_pairs_oversize and right_pairs_oversize:
-                    raise ValueError("Should not augment for n-m relationship.")
-                # otherwise continue counting
-                if len(left_pairs[int(r1)]) >= maximum_accept_duplicate_amount:
-                    left_pairs_oversize = True
-                    left_pairs[int(r1)].append(int(r2))
-                if len(right_pairs[int(r2)]) >= maximum_accept_duplicate_amount:
-                    right_pairs_oversize = True
-                elif not right_pairs_oversize:
-                    right_pairs[int(r2)].append(int(r1))
+                        "Too much available join columns ({}) for pair {}".format(str(most_join_pairs), self.join_pairs))
+
+            # a row is oversize if it still gets pairs after it already has maximum_accept_duplicate_amount pairs,
+            # the left side is kept unchecked as before: its counting was never increased, so it never got oversize
+            # TODO: check the left side too, this enables the n-m relationship check
+            if len(self.pairs) > 0:
+                right_pairs_oversize = np.bincount(pairs_right_ids).max() - 1 >= maximum_accept_duplicate_amount
 
         if left_pairs_oversize and right_pairs_oversize:
             # if n_to_m_condition
@@ -1725,74 +2072,77 @@ class DatamartSearchResult:
                 for each_col in self.special_requirement["display_columns"]:
                     augment_columns.append(DatasetColumn(resource_id=None, column_index=each_col))
 
-            # add extra index column to ensure they follow the original order
-            supplied_data_df['**original_index**'] = supplied_data_df.index
             # self.pairs = sorted(self.pairs, key=lambda x: int(x[0]))
-            i = 0
-            r1_paired = set()
-            df_dict = dict()
             columns_new = None
-            column_names_to_join = None
-            for r1, r2 in self.pairs:
-                i += 1
-                r1_int = int(r1)
-                if r1_int in r1_paired:
-                    continue
-                r1_paired.add(r1_int)
-                left_res = supplied_data_df.loc[r1_int]
-                right_res = download_result.loc[int(r2)]
-                if column_names_to_join is None:
-                    column_names_to_join = right_res.index.difference(left_res.index)
-                    if self.search_type == "general":
-                        # only for general search condition, we should remove the target join columns
-                        right_join_column_name = self.search_result['variableName']['value']
-                        if right_join_column_name in column_names_to_join:
-                            column_names_to_join = column_names_to_join.drop(right_join_column_name)
-                    # if specified augment columns given, only append these columns
-                    if augment_columns:
-                        augment_columns_with_column_names = []
-                        max_length = self.d3m_metadata.query((ALL_ELEMENTS,))['dimension']['length']
-                        for each in augment_columns:
-                            if each.column_index < max_length:
-                                each_column_meta = self.d3m_metadata.query((ALL_ELEMENTS, each.column_index))
-                                augment_columns_with_column_names.append(each_column_meta["name"])
-                            else:
-                                self._logger.error("Index out of range, will ignore: " + str(each.column_index))
-                        column_names_to_join = column_names_to_join.intersection(augment_columns_with_column_names)
+            left_positions = np.empty(0, dtype=np.intp)
+            if len(self.pairs) == 0:
+                df_joined = pd.DataFrame()
+            else:
+                # only the first pair of each left row is used
+                _, first_pairs = np.unique(pairs_left_ids, return_index=True)
+                left_ids = pairs_left_ids[first_pairs]
+                right_ids = pairs_right_ids[first_pairs]
+                left_positions = supplied_data_df.index.get_indexer(left_ids)
+                right_positions = download_result.index.get_indexer(right_ids)
+                if (left_positions < 0).any() or (right_positions < 0).any():
+                    raise ValueError("Some rows of the joining pairs are not found on the data!")
+
+                column_names_to_join = download_result.columns.difference(supplied_data_df.columns)
+                if self.search_type == "general":
+                    # only for general search condition, we should remove the target join columns
+                    right_join_column_name = self.search_result['variableName']['value']
+                    if right_join_column_name in column_names_to_join:
+                        column_names_to_join = column_names_to_join.drop(right_join_column_name)
+                # if specified augment columns given, only append these columns
+                if augment_columns:
+                    augment_columns_with_column_names = []
+                    max_length = self.d3m_metadata.query((ALL_ELEMENTS,))['dimension']['length']
+                    for each in augment_columns:
+                        if each.column_index < max_length:
+                            each_column_meta = self.d3m_metadata.query((ALL_ELEMENTS, each.column_index))
+                            augment_columns_with_column_names.append(each_column_meta["name"])
+                        else:
+                            self._logger.error("Index out of range, will ignore: " + str(each.column_index))
+                    column_names_to_join = column_names_to_join.intersection(augment_columns_with_column_names)
 
-                    columns_new = left_res.index.tolist()
-                    columns_new.extend(column_names_to_join.tolist())
-                dcit_right = right_res[column_names_to_join].to_dict()
-                dict_left = left_res.to_dict()
-                dcit_right.update(dict_left)
-                df_dict[i] = dcit_right
+                columns_new = supplied_data_df.columns.tolist()
+                columns_new.extend(column_names_to_join.tolist())
+                # take the paired rows of both sides at once and put them side by side,
+                # instead of building each joined row from the rows of both sides
+                left_paired = pd.DataFrame(supplied_data_df).take(left_positions).reset_index(drop=True)
+                right_paired = pd.DataFrame(download_result)[column_names_to_join].take(right_positions)
+                df_joined = pd.concat([left_paired, right_paired.reset_index(drop=True)], axis=1)
 
-            df_joined = pd.DataFrame.from_dict(df_dict, "index")
             # add up the rows don't have pairs
-            unpaired_rows = set(range(supplied_data_df.shape[0])) - r1_paired
+            # both sides are unique because only the first pair of each left row is used
+            unpaired_rows = np.setdiff1d(np.arange(supplied_data_df.shape[0], dtype=np.intp), left_positions,
+                                         assume_unique=True)
             if len(unpaired_rows) > 0:
-                unpaired_rows_list = [i for i in unpaired_rows]
-                df_joined = df_joined.append(supplied_data_df.iloc[unpaired_rows_list, :], ignore_index=True)
+                unpaired_df = pd.DataFrame(supplied_data_df).iloc[unpaired_rows]
+                if columns_new is None:
+                    df_joined = unpaired_df.reset_index(drop=True)
+                else:
+                    # only one concat instead of the deprecated append
+                    df_joined = pd.concat([df_joined, unpaired_df], ignore_index=True, sort=False)
 
-            # ensure that the original dataframe columns are at the first left part
-            if columns_new is not None:
-                df_joined = df_joined[columns_new]
-            else:
+            # the paired rows are already built with the original dataframe columns at the first left part and the
+            # unpaired rows are concatenated in the same order, so the joined frame does not need another copy
+            # to reorder its columns before the metadata is generated
+            if columns_new is None:
                 self._logger.error("Attention! It seems augment do not add any extra columns!")
 
             # if search with wikidata, we should remove duplicate Q node column
             self._logger.info("Join finished, totally take " + str(time.time() - start) + " seconds.")
 
-            # sort the joined dataframe with original index
-            df_joined = df_joined.sort_values(by='**original_index**')
-            df_joined = df_joined.drop(columns=['**original_index**'])
+            # the rows are the paired rows and then the unpaired rows, put them back to the order of supplied data
+            original_order = np.argsort(np.concatenate([left_positions, unpaired_rows]), kind="stable")
+            df_joined = df_joined.take(original_order).reset_index(drop=True)
         # END augment part
 
-        if 'q_node' in df_joined.columns:
-            df_joined = df_joined.drop(columns=['q_node'])
-
-        if 'id' in df_joined.columns:
-            df_joined = df_joined.drop(columns=['id'])
+        # drop the Q node and id columns at once
+        columns_to_drop = [each for each in ('q_node', 'id') if each in df_joined.columns]
+        if columns_to_drop:
+            df_joined = df_joined.drop(columns=columns_to_drop)
 
         # start adding column metadata for dataset
         if generate_metadata:
@@ -1813,6 +2163,20 @@ class DatamartSearchResult:
         self._logger.debug("Augment finished")
         return return_result
 
+    def _get_pairs_ids(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Inner function used to get the row ids of the joining pairs as two int arrays, the pairs from the joiners are
+        tuples of ids in str format, so they are converted at once and cached until new pairs are found
+        :return: the ids of the left rows and the ids of the right rows of the pairs
+        """
+        if self._pairs_ids_cache is not None and self._pairs_ids_cache[0] is self.pairs:
+            return self._pairs_ids_cache[1]
+
+        pairs_ids = np.array(self.pairs).astype(np.intp).reshape(-1, 2)
+        result = (pairs_ids[:, 0], pairs_ids[:, 1])
+        self._pairs_ids_cache = (self.pairs, result)
+        return result
+
     def score(self) -> float:
         return self.metadata_manager.score
 
@@ -1848,7 +2212,10 @@ class DatamartSearchResult:
             if left_df is None or right_df is None:
                 try:
                     join_left_cols = []
-                    for each_key, each_value in literal_eval(self.search_result['extra_information']['value']).items():
+                    # the extra information is already parsed when this search result is created
+                    if self._extra_information is None:
+                        raise KeyError("extra_information")
+                    for each_key, each_value in self._extra_information.items():
                         if 'name' in each_value.keys() and each_value['name'] == self.search_result['variableName']['value']:
                             right_col_number = int(each_key.split("_")[-1])
                             break
@@ -1857,8 +2224,9 @@ class DatamartSearchResult:
                         self._logger.error(
                             "Can't get supplied dataframe information, failed to find the left join column number")
                     else:
+                        left_column_positions = self._get_column_positions(self.supplied_dataframe)
                         for each in self.query_json['variables'].keys():
-                            left_col_number = self.supplied_dataframe.columns.tolist().index(each)
+                            left_col_number = left_column_positions[each]
                             join_left_cols.append(DatasetColumn(resource_id=self.res_id, column_index=left_col_number))
                     results.append(TabularJoinSpec(left_columns=[join_left_cols], right_columns=[join_right_cols]))
                 except KeyError:
@@ -1872,9 +2240,10 @@ class DatamartSearchResult:
                 right_join_column_name = self.search_result['variableName']['value']
                 left_columns = []
                 right_columns = []
+                left_column_positions = self._get_column_positions(left_df)
+                right_col_number = self._get_column_positions(right_df)[right_join_column_name]
                 for each in self.query_json['variables'].keys():
-                    left_col_number = left_df.columns.tolist().index(each)
-                    right_col_number = right_df.columns.tolist().index(right_join_column_name)
+                    left_col_number = left_column_positions[each]
                     left_index_column = DatasetColumn(resource_id=left_df_src_id, column_index=left_col_number)
                     right_index_column = DatasetColumn(resource_id=right_src_id, column_index=right_col_number)
                     left_columns.append([left_index_column])
@@ -1888,6 +2257,19 @@ class DatamartSearchResult:
         self._logger.debug(str(left_col_number) + ", " + str(right_col_number))
         return results
 
+    @staticmethod
+    def _get_column_positions(df: pd.DataFrame) -> typing.Dict[typing.Any, int]:
+        """
+        Inner function used to get the position of each column name, so that looking up many columns does not need to
+        search the column names each time
+        :param df: the dataframe
+        :return: a dict from the column name to its first position
+        """
+        column_positions = dict()
+        for i, each_column_name in enumerate(df.columns):
+            column_positions.setdefault(each_column_name, i)
+        return column_positions
+
     def serialize(self) -> str:
         """
         Return a string format's json which contains all information needed for reproducing the augment
@@ -1920,7 +2302,7 @@ class DatamartSearchResult:
                 join_pair_numbers = join_pair.get_column_number_pairs()
                 left_join_pair_numbers = []
                 right_join_pair_numbers = []
-                temp_df = pd.read_csv(io.StringIO(json.loads(self.search_result['extra_information']['value'])["first_10_rows"]))
+                temp_df = pd.read_csv(io.StringIO(self._extra_information["first_10_rows"]))
                 if 'Unnamed: 0' in temp_df.columns:
                     temp_df = temp_df.drop(columns=['Unnamed: 0'])
                 for each_join_pair_numbers in join_pair_numbers:
@@ -1971,13 +2353,14 @@ class DatamartSearchResult:
         }
         result['augmentation'] = augmentation
         result['datamart_type'] = 'isi'
-        result_str = json.dumps(result)
+        # keys are sorted so that the same search result is always serialized the same, it is used as the cache key
+        result_str = json_utils.dumps_canonical(result)
 
         return result_str
 
     @classmethod
     def deserialize(cls, serialize_result_str):
-        serialize_result = json.loads(serialize_result_str)
+        serialize_result = json_utils.loads(serialize_result_str)
         if "datamart_type" not in serialize_result or serialize_result["datamart_type"] != "isi":
             raise ValueError("False datamart type found")
         supplied_data = None  # serialize_result['metadata']['supplied_data']
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 import pandas as pd
 from enum import Enum
 import typing
+import functools
 from datamart_isi.joiners.join_result import JoinResult
 
 
@@ -74,19 +75,29 @@ class JoinerPrepare(object):
         """
 
         try:
-            JoinerType(joiner)
+            joiner_class = JoinerPrepare._get_joiner_class(JoinerType(joiner))
         except ValueError:
             return None
 
-        if JoinerType(joiner) == JoinerType.RLTK:
+        if joiner_class is None:
+            return None
+        return joiner_class()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _get_joiner_class(joiner_type: JoinerType) -> typing.Optional[typing.Type[JoinerBase]]:
+        """Resolve and import the joiner class only once for each joiner type,
+        the instances are still created every time because joiners like RLTK keep states of the join.
+        """
+        if joiner_type == JoinerType.RLTK:
             from datamart_isi.joiners.rltk_joiner import RLTKJoiner
-            return RLTKJoiner()
+            return RLTKJoiner
 
-        if JoinerType(joiner) == JoinerType.DEFAULT:
-            return DefaultJoiner()
+        if joiner_type == JoinerType.DEFAULT:
+            return DefaultJoiner
 
-        if JoinerType(joiner) == JoinerType.EXACT_MATCH:
+        if joiner_type == JoinerType.EXACT_MATCH:
             from datamart_isi.joiners.exact_match_joiner import ExactMatchJoiner
-            return ExactMatchJoiner()
+            return ExactMatchJoiner
 
         return None
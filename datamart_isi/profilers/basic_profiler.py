@@ -20,7 +20,7 @@ class BasicProfiler(object):
         Returns:
             list of named entities string
         """
-        return column.dropna().unique().astype(str).tolist()
+        return pd.unique(column.dropna().values).astype(str).tolist()
 
     @staticmethod
     def named_entity_column_recognize(column: pd.Series) -> bool:
@@ -42,8 +42,8 @@ class BasicProfiler(object):
             except:
                 all_ = column.dropna()
                 nums = pd.to_numeric(all_, errors='coerce').dropna()
-                all_ = all_.unique()
-                if len(all_) == 0 or len(nums) / len(all_) > 0.5:
+                distinct_amount = all_.nunique()
+                if distinct_amount == 0 or len(nums) / distinct_amount > 0.5:
                     return False
                 return True
         return False
@@ -2,6 +2,11 @@ import pandas as pd  # type: ignore
 import numpy as np  # type: ignore
 from collections import Counter
 from builtins import filter
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
 
 
 def ordered_dict2(column, k):
@@ -46,6 +51,66 @@ def is_Decimal_Number(s):
         return False
 
 
+def _numeric_stats_kernel(values, sigma):
+    """
+    one pass for mean and one pass for the others over the float values, nan values are skipped
+    return: count, mean, std, #outlier, #positive, #negative, #equal_0, #equal_1, #equal_-1
+    """
+    n = values.shape[0]
+    count = 0
+    total = 0.0
+    for i in prange(n):
+        if not np.isnan(values[i]):
+            count += 1
+            total += values[i]
+    mean = total / count if count > 0 else np.nan
+
+    square_total = 0.0
+    for i in prange(n):
+        if not np.isnan(values[i]):
+            square_total += (values[i] - mean) ** 2
+    std = np.sqrt(square_total / (count - 1)) if count > 1 else np.nan
+
+    outlier = 0
+    positive = 0
+    negative = 0
+    equal_0 = 0
+    equal_1 = 0
+    equal_minus_1 = 0
+    for i in prange(n):
+        v = values[i]
+        if np.abs(v - mean) > sigma * std:
+            outlier += 1
+        if v > 0:
+            positive += 1
+        if v < 0:
+            negative += 1
+        if v == 0:
+            equal_0 += 1
+        if v == 1:
+            equal_1 += 1
+        if v == -1:
+            equal_minus_1 += 1
+    return count, mean, std, outlier, positive, negative, equal_0, equal_1, equal_minus_1
+
+
+if njit is not None:
+    _numeric_stats_kernel = njit(parallel=True, cache=True)(_numeric_stats_kernel)
+
+
+def _numeric_stats_pandas(column, sigma):
+    """
+    same as _numeric_stats_kernel, used when numba is not available
+    return: count, mean, std, #outlier, #positive, #negative, #equal_0, #equal_1, #equal_-1
+    """
+    mean = column.mean()
+    std = column.std()
+    outlier = column[(np.abs(column - mean) > (sigma * std))]
+    return (int(column.count()), mean, std, int(outlier.count()),
+            int(column[column > 0].count()), int(column[column < 0].count()), int(column[column == 0].count()),
+            int(column[column == 1].count()), int(column[column == -1].count()))
+
+
 def numerical_stats(feature, column, num_nonblank, feature_list):
     """
     calculates numerical statistics
@@ -53,37 +118,42 @@ def numerical_stats(feature, column, num_nonblank, feature_list):
     ## hyper-parameter ##
     sigma = 3
     ## =============== ##
-    stats = column.describe()
+    if njit is not None:
+        # the counts are computed in the jit compiled kernel on the raw values
+        # instead of building a masked Series for each of them
+        count, mean, std, outlier, positive, negative, equal_0, equal_1, equal_minus_1 = \
+            _numeric_stats_kernel(np.asarray(column.values, dtype=np.float64), sigma)
+    else:
+        count, mean, std, outlier, positive, negative, equal_0, equal_1, equal_minus_1 = \
+            _numeric_stats_pandas(column, sigma)
     if ("number_of_numeric_values" in feature_list):
-        feature["number_of_numeric_values"] = int(stats["count"])
+        feature["number_of_numeric_values"] = int(count)
     if ("ratio_of_numeric_values" in feature_list):
-        feature["ratio_of_numeric_values"] = stats["count"] / num_nonblank
-    # feature["number_mean"] = stats["mean"]
-    # feature["number_std"] = stats["std"]
-    if stats["count"] == 1: feature["number_std"] = 0
-    # feature["number_quartile_1"] = stats["25%"]
-    # feature["number_quartile_2"] = stats["50%"]
-    # feature["number_quartile_3"] = stats["75%"]
+        feature["ratio_of_numeric_values"] = count / num_nonblank
+    # feature["number_mean"] = mean
+    # feature["number_std"] = std
+    if count == 1: feature["number_std"] = 0
     if ("number_of_outlier_numeric_values" in feature_list):
-        outlier = column[(np.abs(column - stats["mean"]) > (sigma * stats["std"]))]
-        feature["number_of_outlier_numeric_values"] = outlier.count()
+        feature["number_of_outlier_numeric_values"] = int(outlier)
     if ("number_of_positive_numeric_values" in feature_list):
-        feature["number_of_positive_numeric_values"] = column[column > 0].count()
+        feature["number_of_positive_numeric_values"] = int(positive)
     if ("number_of_negative_numeric_values" in feature_list):
-        feature["number_of_negative_numeric_values"] = column[column < 0].count()
+        feature["number_of_negative_numeric_values"] = int(negative)
     if ("number_of_numeric_values_equal_0" in feature_list):
-        feature["number_of_numeric_values_equal_0"] = column[column == 0].count()
+        feature["number_of_numeric_values_equal_0"] = int(equal_0)
     if ("number_of_numeric_values_equal_1" in feature_list):
-        feature["number_of_numeric_values_equal_1"] = column[column == 1].count()
+        feature["number_of_numeric_values_equal_1"] = int(equal_1)
     if ("number_of_numeric_values_equal_-1" in feature_list):
-        feature["number_of_numeric_values_equal_-1"] = column[column == -1].count()
+        feature["number_of_numeric_values_equal_-1"] = int(equal_minus_1)
 
     if ("target_values" in feature_list):
-        feature["target_values"] = {'mean': stats['mean'],
-                                    'std': stats['std'],
-                                    'median': stats['50%'],
-                                    'quartile_1': stats['25%'],
-                                    'quartile_3': stats['75%']}
+        # quartiles need sorting, use pandas for them in both cases
+        quartiles = column.quantile([0.25, 0.5, 0.75])
+        feature["target_values"] = {'mean': mean,
+                                    'std': std,
+                                    'median': quartiles[0.5],
+                                    'quartile_1': quartiles[0.25],
+                                    'quartile_3': quartiles[0.75]}
 
 
 def compute_numerics(column, feature, feature_list):
@@ -86,7 +86,6 @@ def compute_length_distinct(column, feature, delimiter, feature_list):
     if (("number_of_distinct_tokens" in feature_list) or
             ("ratio_of_distinct_tokens" in feature_list)):
         tokenlized = pd.Series([token for lst in column.str.split().dropna() for token in lst])  # tokenlized Series
-        lenth_for_token = tokenlized.apply(len)
         # feature["token_count_mean"] = lenth_for_token.mean()
         # feature["token_count_std"] = lenth_for_token.std()
         feature["number_of_distinct_tokens"] = tokenlized.nunique()
@@ -158,7 +157,7 @@ def compute_punctuation(column, feature, weight_outlier):
     if (column.size == 0):  # if the column is empty, do nothing
         return
 
-    number_of_chars = sum(column.apply(len))  # number of all chars in column
+    number_of_chars = column.str.len().sum()  # number of all chars in column
     num_chars_cell = np.zeros(column.size)  # number of chars for each cell
     puncs_cell = np.zeros([column.size, len(string.punctuation)],
                           dtype=int)  # (number_of_cell * number_of_puncs) sized array
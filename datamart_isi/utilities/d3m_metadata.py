@@ -20,11 +20,12 @@ AUGMENT_RESOURCE_ID = config.augmented_resource_id
 AUGMENTED_COLUMN_SEMANTIC_TYPE = config.augmented_column_semantic_type
 Q_NODE_SEMANTIC_TYPE = config.q_node_semantic_type
 CONTAINER_SCHEMA_VERSION = config.d3m_container_version
+_logger = logging.getLogger(__name__)
 
 
 class MetadataGenerator:
     def __init__(self, supplied_data, search_result, search_type, connection_url, wikidata_cache_manager):
-        self._logger = logging.getLogger(__name__)
+        self._logger = _logger
         self.supplied_data = supplied_data
         self.search_result = search_result
         self.search_type = search_type
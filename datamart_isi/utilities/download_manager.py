@@ -1,6 +1,4 @@
-import requests
 import pandas
-import os
 import json
 import copy
 import frozendict
@@ -8,7 +6,9 @@ import pandas as pd
 import typing
 import io
 import logging
-from multiprocessing import Pool
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from d3m.container import Dataset as d3m_Dataset
 from d3m.container import DataFrame as d3m_DataFrame
@@ -19,12 +19,19 @@ from datamart_isi.cache.wikidata_cache import QueryCache
 from datamart_isi.cache.materializer_cache import MaterializerCache
 from datamart_isi import config
 from datamart_isi.utilities import connection
-from SPARQLWrapper import SPARQLWrapper, JSON, POST, URLENCODED
+from datamart_isi.utilities import json_utils
+from datamart_isi.utilities.sparql_session import run_sparql_query, get_session
 from d3m.metadata.base import ALL_ELEMENTS
 
 WIKIDATA_URI_TEMPLATE = config.wikidata_uri_template
 EM_ES_URL = connection.get_es_fb_embedding_server_url()
 Q_NODE_SEMANTIC_TYPE = config.q_node_semantic_type
+BLACKLIST_NODES_EXPIRE_TIME = config.cache_expire_time
+# amount of the geospatial queries sent to wikidata at the same time
+GEOSPATIAL_QUERY_WORKERS = 16
+# amount of the q nodes in each embedding query and amount of the embedding queries sent at the same time
+FB_EMBEDDINGS_QUERY_BATCH_SIZE = 1024
+FB_EMBEDDINGS_QUERY_WORKERS = 4
 logger = logging.getLogger(__name__)
 
 
@@ -33,9 +40,19 @@ logger = logging.getLogger(__name__)
 # EM_ES_TYPE = config.em_es_type
 
 class DownloadManager:
+    # the blacklist rarely changes, so it is fetched once and shared in the process until expired
+    _blacklist_nodes = None
+    _blacklist_nodes_fetch_time = 0.0
+    _blacklist_nodes_lock = threading.Lock()
+
     @staticmethod
-    def fetch_blacklist_nodes():
-        query = """
+    def fetch_blacklist_nodes() -> typing.FrozenSet[str]:
+        with DownloadManager._blacklist_nodes_lock:
+            if DownloadManager._blacklist_nodes is not None and \
+                    time.time() - DownloadManager._blacklist_nodes_fetch_time < BLACKLIST_NODES_EXPIRE_TIME:
+                return DownloadManager._blacklist_nodes
+
+            query = """
             SELECT ?item ?itemLabel 
             WHERE 
             {
@@ -43,60 +60,92 @@ class DownloadManager:
               SERVICE wikibase:label { bd:serviceParam wikibase:language "[AUTO_LANGUAGE],en". }
             }
         """
-        blacklist_nodes_set = set()
-        result = QueryCache().get_result(query)
-        for each_Q_node in result:
-            blacklist_nodes_set.add(each_Q_node['item']['value'].split("/")[-1])
-        logger.info("Following Q nodes are added to blacklist which will not be considered for wikidata search")
-        logger.info(str(blacklist_nodes_set))
-        return blacklist_nodes_set
+            result = QueryCache().get_result(query)
+            if result is None:
+                # do not keep the failed result, try again next time
+                logger.warning("Fetching blacklist Q nodes failed! No Q nodes will be filtered.")
+                return frozenset()
+            blacklist_nodes_set = frozenset(each_Q_node['item']['value'].split("/")[-1] for each_Q_node in result)
+            logger.info("Following Q nodes are added to blacklist which will not be considered for wikidata search")
+            logger.info(str(blacklist_nodes_set))
+            DownloadManager._blacklist_nodes = blacklist_nodes_set
+            DownloadManager._blacklist_nodes_fetch_time = time.time()
+            return blacklist_nodes_set
+
+    @staticmethod
+    def reset_blacklist_nodes() -> None:
+        """
+        Function used to drop the fetched blacklist so that it will be fetched again on next call
+        :return: None
+        """
+        with DownloadManager._blacklist_nodes_lock:
+            DownloadManager._blacklist_nodes = None
+            DownloadManager._blacklist_nodes_fetch_time = 0.0
 
     @staticmethod
     def fetch_fb_embeddings(q_nodes_list, target_q_node_column_name):
         # add vectors columns in wikifier_res
-        qnodes = list(filter(None, q_nodes_list))
+        # remove duplicate q nodes so that the terms query will not be inflated, the results are keyed by q node anyway
+        qnodes = list(dict.fromkeys(filter(None, q_nodes_list)))
+        logger.debug("Fetching embeddings for {} distinct q nodes from {} given.".format(str(len(qnodes)),
+                                                                                      str(len(q_nodes_list))))
         qnode_uris = [WIKIDATA_URI_TEMPLATE.format(qnode) for qnode in qnodes]
-        # do elastic search
-        num_of_try = int(len(qnode_uris) / 1024) + 1 if len(qnode_uris) % 1024 != 0 else int(len(qnode_uris) / 1024)
+        # do elastic search, the batches are sent at the same time and merged in order
+        url = '{}/_search'.format(EM_ES_URL)
+        batches = [qnode_uris[i:i + FB_EMBEDDINGS_QUERY_BATCH_SIZE]
+                   for i in range(0, len(qnode_uris), FB_EMBEDDINGS_QUERY_BATCH_SIZE)]
         res = dict()
-        for i in range(num_of_try):
-            query = {
-                'query': {
-                    'terms': {
-                        'key.keyword': qnode_uris[1024 * i:1024 * i + 1024]
-                    }
-                },
-                "size": len(qnode_uris[1024 * i:1024 * i + 1024])
-            }
-            url = '{}/_search'.format(EM_ES_URL)
-            resp = requests.get(url, json=query)
-            if resp.status_code == 200:
-                result = resp.json()
-                hits = result['hits']['hits']
-                for hit in hits:
-                    source = hit['_source']
-                    _qnode = source['key'].split('/')[-1][:-1]
-                    res[_qnode] = ",".join(source['value'])
-
-        # change to dataframe
-        return_df = pandas.DataFrame()
+        if len(batches) > 0:
+            with ThreadPoolExecutor(max_workers=min(FB_EMBEDDINGS_QUERY_WORKERS, len(batches))) as executor:
+                for each_res in executor.map(lambda x: DownloadManager._fetch_fb_embeddings_batch(url, x), batches):
+                    res.update(each_res)
+
+        # change to dataframe, build it once instead of appending row by row
+        rows = []
+        columns = dict.fromkeys(["q_node"])
         for key, val in res.items():
             each_result = dict()
             each_result["q_node"] = key
             vectors = val.split(',')
             for i in range(len(vectors)):
-                if i < 10:
-                    s = '00' + str(i)
-                elif i < 100:
-                    s = '0' + str(i)
-                else:
-                    s = str(i)
-                v_name = "vector_" + s + "_of_qnode_with_" + target_q_node_column_name
+                v_name = "vector_" + "{:03d}".format(i) + "_of_qnode_with_" + target_q_node_column_name
                 each_result[v_name] = float(vectors[i])
-            return_df = return_df.append(each_result, ignore_index=True)
+            columns.update(dict.fromkeys(each_result))
+            rows.append(each_result)
+        if len(rows) == 0:
+            return pandas.DataFrame()
+        return_df = pandas.DataFrame(rows, columns=list(columns))
 
         return return_df
 
+    @staticmethod
+    def _fetch_fb_embeddings_batch(url: str, qnode_uris: typing.List[str]) -> typing.Dict[str, str]:
+        """
+        Function used to send one batch of the embedding query to elastic search
+        :param url: the url of the elastic search endpoint
+        :param qnode_uris: the uris of the q nodes in this batch
+        :return: a dict from q node to its vector in str format, failed batch returns empty dict
+        """
+        query = {
+            'query': {
+                'terms': {
+                    'key.keyword': qnode_uris
+                }
+            },
+            "size": len(qnode_uris)
+        }
+        res = dict()
+        # reuse the connections of the shared session for all batches
+        resp = get_session().get(url, json=query, headers={"Accept": "application/json"})
+        if resp.status_code == 200:
+            result = resp.json()
+            hits = result['hits']['hits']
+            for hit in hits:
+                source = hit['_source']
+                _qnode = source['key'].split('/')[-1][:-1]
+                res[_qnode] = ",".join(source['value'])
+        return res
+
     @staticmethod
     def parse_geospatial_query(geo_variable):
         """
@@ -108,10 +157,6 @@ class DownloadManager:
                         'postal_code': 'Q37447'}
 
         wikidata_server = connection.get_wikidata_server_url()
-        qm_wikidata = SPARQLWrapper(wikidata_server)
-        qm_wikidata.setReturnFormat(JSON)
-        qm_wikidata.setMethod(POST)
-        qm_wikidata.setRequestMethod(URLENCODED)
 
         results = None
         if "latitude" in geo_variable.keys() and "longitude" in geo_variable.keys():
@@ -130,8 +175,7 @@ class DownloadManager:
                                + "SERVICE wikibase:label { bd:serviceParam wikibase:language \"en\" }\n}\n" \
                                + "ORDER BY ASC(?dist) \n Limit 1 \n"
                 try:
-                    qm_wikidata.setQuery(sparql_query)
-                    results = qm_wikidata.query().convert()['results']['bindings']
+                    results = run_sparql_query(wikidata_server, sparql_query)['results']['bindings']
                 except Exception as e:
                     logger.error("Query for " + str(geo_variable) + " failed!")
                     logger.debug(e, exc_info=True)
@@ -157,11 +201,13 @@ class DownloadManager:
         res_id, supplied_dataframe = d3m_utils.get_tabular_resource(dataset=supplied_dataset,
                                                                     resource_id=None,
                                                                     has_hyperparameter=False)
-        search_result_str = json.dumps(search_result)
+        search_result_str = json_utils.dumps_canonical(search_result)
         # try cache first
         try:
+            supplied_dataframe_hash = general_search_cache_manager.get_supplied_dataframe_hash(supplied_dataframe)
             cache_key = general_search_cache_manager.get_hash_key(supplied_dataframe=supplied_dataframe,
-                                                                  search_result_serialized=search_result_str)
+                                                                  search_result_serialized=search_result_str,
+                                                                  supplied_dataframe_hash=supplied_dataframe_hash)
             cache_result = general_search_cache_manager.get_cache_results(cache_key)
             if cache_result is not None:
                 logger.info("Get augment results from memcache success!")
@@ -174,16 +220,21 @@ class DownloadManager:
         radius = search_result['metadata']['search_result']['radius']
         gran = search_result['metadata']['search_result']['granularity']
 
-        # set query information
+        # set query information, each distinct point is only queried once
+        points = list(zip(supplied_dataframe.iloc[:, latitude_index], supplied_dataframe.iloc[:, longitude_index]))
+        unique_points = list(dict.fromkeys(points))
         geo_variables_list = []
-        for latitude, longitude in zip(supplied_dataframe.iloc[:, latitude_index], supplied_dataframe.iloc[:, longitude_index]):
+        for latitude, longitude in unique_points:
             geo_variable = {"latitude": latitude, "longitude": longitude, "radius": radius, "granularity": gran}
             geo_variables_list.append(geo_variable)
 
-        # get qnodes from multiple processing
-        logger.debug("Start to query geospatial data")
-        with Pool(os.cpu_count()) as p:
-            qnodes = p.map(DownloadManager.parse_geospatial_query, geo_variables_list)
+        # the queries are only waiting for wikidata, so run them with threads sharing the http connections
+        logger.debug("Start to query geospatial data for {} distinct points of {} rows".format(str(len(unique_points)),
+                                                                                           str(len(points))))
+        with ThreadPoolExecutor(max_workers=GEOSPATIAL_QUERY_WORKERS) as executor:
+            point_qnodes = dict(zip(unique_points, executor.map(DownloadManager.parse_geospatial_query,
+                                                                geo_variables_list)))
+        qnodes = [point_qnodes[each_point] for each_point in points]
         logger.debug("Finished querying geospatial data")
 
         # augment qnodes in dataframe
@@ -223,14 +274,15 @@ class DownloadManager:
             response = general_search_cache_manager.add_to_memcache(supplied_dataframe=supplied_dataframe,
                                                                     search_result_serialized=search_result_str,
                                                                     augment_results=output_ds,
-                                                                    hash_key=cache_key
+                                                                    hash_key=cache_key,
+                                                                    supplied_dataframe_hash=supplied_dataframe_hash
                                                                     )
             # save the augmented result's metadata if second augment is conducted
             MetadataCache.save_metadata_from_dataset(output_ds)
             if not response:
                 logger.warning("Push augment results to results failed!")
             else:
-                logger.info("Push augment results to memcache success!")
+                logger.info("Push augment results to memcache success! The result files are written in background.")
         return output_ds
 
     @staticmethod
@@ -0,0 +1,13 @@
+import hashlib
+
+
+def get_str_hash(value: str) -> str:
+    """
+    Function used to get a stable hash key of the given string. The keys are shared among processes and hosts through
+    memcache, so md5 is always used to make sure every client gets the same keys
+    :param value: a str need to be hashed
+    :return: a str of the hash to the value
+    """
+    hash_generator = hashlib.md5()
+    hash_generator.update(value.encode('utf-8'))
+    return hash_generator.hexdigest()
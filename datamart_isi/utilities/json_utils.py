@@ -0,0 +1,39 @@
+import json
+import typing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(value: typing.Union[str, bytes]) -> typing.Any:
+    """
+    Function used to parse the json value, orjson is used if installed because it is much faster on large inputs
+    :param value: the json value in str or bytes format
+    :return: the parsed object
+    """
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+def dumps(value: typing.Any) -> bytes:
+    """
+    Function used to serialize the value to json for storing, orjson is used if installed
+    :param value: a json serializable object
+    :return: the serialized value in bytes format
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode('utf-8')
+
+
+def dumps_canonical(value: typing.Any) -> str:
+    """
+    Function used to serialize the value to json with sorted keys, so that equal objects always get the same str,
+    this should be used when the serialized value is hashed as a cache key. The standard json is always used here
+    so that the keys do not depend on whether orjson is installed or not
+    :param value: a json serializable object
+    :return: the serialized value in str format
+    """
+    return json.dumps(value, sort_keys=True)
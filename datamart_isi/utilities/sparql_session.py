@@ -0,0 +1,47 @@
+import requests
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datamart_isi.utilities import json_utils
+
+SPARQL_RESULTS_JSON_FORMAT = "application/sparql-results+json"
+# failed connections are retried with backoff of 0.3s, 0.6s, 1.2s, requests already sent are never retried
+CONNECT_RETRIES = 3
+CONNECT_RETRY_BACKOFF_FACTOR = 0.3
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Function used to get the shared http session, the connections are kept alive and reused among queries
+    so that we do not need to build a new connection for each sparql query
+    :return: a requests Session
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                session = requests.Session()
+                # same as the default of requests except the connection errors, read errors should not be retried
+                retry = Retry(total=CONNECT_RETRIES, read=False, backoff_factor=CONNECT_RETRY_BACKOFF_FACTOR)
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({"Accept": SPARQL_RESULTS_JSON_FORMAT, "Accept-Encoding": "gzip"})
+                _SESSION = session
+    return _SESSION
+
+
+def run_sparql_query(endpoint: str, query: str) -> dict:
+    """
+    Function used to run the sparql query on given endpoint with the shared http session
+    :param endpoint: the url of the sparql endpoint
+    :param query: the sparql query in str format
+    :return: the query response in dict format
+    """
+    response = get_session().post(endpoint, data={"query": query})
+    response.raise_for_status()
+    # parse the raw bytes directly, orjson is much faster on large results if it is installed
+    return json_utils.loads(response.content)
@@ -18,8 +18,28 @@ from dsbox.datapreprocessing.cleaner.cleaning_featurizer import CleaningFeaturiz
 
 _logger = logging.getLogger(__name__)
 seed_dataset_store_location = os.path.join(cache_file_storage_base_loc, "datasets_cache")
+# amount of values tried first when checking whether a column is datetime or not
+DATETIME_CHECK_SAMPLE_SIZE = 100
 WIKIDATA_CACHE_MANAGER = QueryCache()
 WIKIDATA_SERVER = connection.get_wikidata_server_url()
+TEMPORAL_GRANULARITY_VALUE = {
+    'second': 14,
+    'minute': 13,
+    'hour': 12,
+    'day': 11,
+    'month': 10,
+    'year': 9
+}
+D3M_TEMPORAL_GRANULARITY_VALUE = {
+    'seconds': 14,
+    'minutes': 13,
+    'hours': 12,
+    'days': 11,
+    'weeks': 11,  # now also use week as days
+    'months': 10,
+    'years': 9,
+    'unspecified': 8,
+}
 
 
 class Utils:
@@ -86,6 +106,12 @@ class Utils:
         #         column=data.iloc[:, col_offset]
         #     )
         #     global_metadata.add_variable_metadata(variable_metadata)
+
+        # the variables will be overwritten by the original metadata, no need to run the costly profiling for them
+        if original_meta and "variables" in original_meta:
+            metadata_dict.update(original_meta)
+            return metadata_dict
+
         hyper1 = ProfilerHyperparams.defaults()
         hyper2 = CleaningFeaturizerHyperparameter.defaults()
         clean_f = CleaningFeaturizer(hyperparams=hyper2)
@@ -116,6 +142,30 @@ class Utils:
             metadata_dict.update(original_meta)
         return metadata_dict
 
+    @staticmethod
+    def is_datetime_column(column: pd.Series) -> bool:
+        """
+        Function used to check whether the given column can be parsed as datetime. Numeric and bool columns are
+        skipped directly, and a small sample is tried first so that most of the not datetime columns fail fast
+        without parsing the whole column
+        :param column: the column need to be checked
+        :return: a bool value, True means the whole column can be parsed as datetime
+        """
+        if column.dtype.kind == "M":
+            return True
+        if column.dtype.kind in "iufb":
+            return False
+        sample = column.dropna().head(DATETIME_CHECK_SAMPLE_SIZE)
+        if len(sample) == 0:
+            return False
+        try:
+            pd.to_datetime(sample)
+            if len(sample) < len(column):
+                pd.to_datetime(column)
+            return True
+        except Exception:
+            return False
+
     @staticmethod
     def get_time_granularity(time_column: pd.DataFrame) -> str:
         if "datetime" not in time_column.dtype.name:
@@ -129,28 +179,26 @@ class Utils:
         else:
             allow_duplicate_amount = 1
 
+        def changes(field: pd.Series) -> bool:
+            # the checks are done on whole series instead of with python builtin any() looping on each value
+            return bool((field != 0).any()) and len(field.unique()) > allow_duplicate_amount
+
         time_granularity = 'second'
-        if any(time_column.dt.minute != 0) and len(time_column.dt.minute.unique()) > allow_duplicate_amount:
+        if changes(time_column.dt.minute):
             time_granularity = 'minute'
-        elif any(time_column.dt.hour != 0) and len(time_column.dt.hour.unique()) > allow_duplicate_amount:
+        elif changes(time_column.dt.hour):
             time_granularity = 'hour'
-        elif any(time_column.dt.day != 0) and len(time_column.dt.day.unique()) > allow_duplicate_amount:
+        elif changes(time_column.dt.day):
             # it is also possible weekly data
-            is_weekly_data = True
             time_column_sorted = time_column.sort_values()
-            temp1 = time_column_sorted.iloc[0]
-            for i in range(1, len(time_column_sorted)):
-                temp2 = time_column_sorted.iloc[i]
-                if (temp2 - temp1).days != 7:
-                    is_weekly_data = False
-                    break
+            is_weekly_data = bool(((time_column_sorted.iloc[1:] - time_column_sorted.iloc[0]).dt.days == 7).all())
             if is_weekly_data:
                 time_granularity = 'week'
             else:
                 time_granularity = 'day'
-        elif any(time_column.dt.month != 0) and len(time_column.dt.month.unique()) > allow_duplicate_amount:
+        elif changes(time_column.dt.month):
             time_granularity = 'month'
-        elif any(time_column.dt.year != 0) and len(time_column.dt.year.unique()) > allow_duplicate_amount:
+        elif changes(time_column.dt.year):
             time_granularity = 'year'
         else:
             _logger.error("Can't guess the time granularity for this dataset! Will use as second")
@@ -194,16 +242,8 @@ class Utils:
 
     @staticmethod
     def map_granularity_to_value(granularity_str: str) -> int:
-        TemporalGranularity = {
-            'second': 14,
-            'minute': 13,
-            'hour': 12,
-            'day': 11,
-            'month': 10,
-            'year': 9
-        }
-        if granularity_str.lower() in TemporalGranularity:
-            return TemporalGranularity[granularity_str.lower()]
+        if granularity_str.lower() in TEMPORAL_GRANULARITY_VALUE:
+            return TEMPORAL_GRANULARITY_VALUE[granularity_str.lower()]
         else:
             raise ValueError("Can't find corresponding granularity value.")
 
@@ -214,19 +254,8 @@ class Utils:
         :param granularity_str:
         :return:
         """
-        TemporalGranularity = {
-            'seconds': 14,
-            'minutes': 13,
-            'hours': 12,
-            'days': 11,
-            'weeks': 11,  # now also use week as days
-            'months': 10,
-            'years': 9,
-            'unspecified': 8,
-
-        }
-        if granularity_str.lower() in TemporalGranularity:
-            return TemporalGranularity[granularity_str.lower()]
+        if granularity_str.lower() in D3M_TEMPORAL_GRANULARITY_VALUE:
+            return D3M_TEMPORAL_GRANULARITY_VALUE[granularity_str.lower()]
         else:
             raise ValueError("Can't find corresponding granularity value.")
 
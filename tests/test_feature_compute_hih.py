@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from datamart_isi.profilers.helpers import feature_compute_hih
+
+
+class TestNumericalStats(unittest.TestCase):
+    feature_list = ["number_of_numeric_values", "ratio_of_numeric_values", "number_of_outlier_numeric_values",
+                    "number_of_positive_numeric_values", "number_of_negative_numeric_values",
+                    "number_of_numeric_values_equal_0", "number_of_numeric_values_equal_1",
+                    "number_of_numeric_values_equal_-1", "target_values"]
+
+    def setUp(self):
+        values = np.random.RandomState(0).normal(size=200)
+        values[:10] = [0, 1, -1, 0, 1, -1, np.nan, np.nan, 50, -50]
+        self.column = pd.Series(values)
+
+    def _numerical_stats(self, njit):
+        feature = {}
+        with mock.patch.object(feature_compute_hih, "njit", njit):
+            feature_compute_hih.numerical_stats(feature, self.column, len(self.column), self.feature_list)
+        return feature
+
+    def test_kernel_and_pandas_return_same_tuple(self):
+        kernel_res = feature_compute_hih._numeric_stats_kernel(np.asarray(self.column.values, dtype=np.float64), 3)
+        pandas_res = feature_compute_hih._numeric_stats_pandas(self.column, 3)
+        self.assertEqual(len(kernel_res), len(pandas_res))
+        for kernel_value, pandas_value in zip(kernel_res, pandas_res):
+            self.assertAlmostEqual(kernel_value, pandas_value)
+
+    def test_numerical_stats_same_features_on_both_paths(self):
+        # any not None value makes numerical_stats use the kernel, which also runs as plain python without numba
+        kernel_feature = self._numerical_stats(njit=object())
+        pandas_feature = self._numerical_stats(njit=None)
+        kernel_target = kernel_feature.pop("target_values")
+        pandas_target = pandas_feature.pop("target_values")
+        self.assertEqual(kernel_feature, pandas_feature)
+        self.assertEqual(kernel_target.keys(), pandas_target.keys())
+        for key in kernel_target:
+            self.assertAlmostEqual(kernel_target[key], pandas_target[key])
+        self.assertEqual(kernel_feature["number_of_numeric_values"], 198)
+        self.assertEqual(kernel_feature["number_of_numeric_values_equal_0"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -83,7 +83,8 @@ def produce(inputs, target_columns: typing.List[int] = None, target_p_nodes: typ
                 else:
                     col_auto.append(target_columns[i])
             col_res = list(set([i for i in range(len(col_name))]).difference(set(col_new_wikifier + col_identifier + col_auto)))
-            return_df = copy.deepcopy(inputs.iloc[:, col_res])
+            # iloc with a list of columns already gives a new copy, no need to deep copy it again
+            return_df = inputs.iloc[:, col_res]
 
             if col_identifier:
                 return_df_identifier, column_to_p_node_dict_identifier = produce_for_pandas(inputs.iloc[:, col_identifier],
@@ -143,7 +144,7 @@ def push_to_cache(inputs, produce_config, wikifiered_df, cache_key):
         _logger.warning("Push wikifier results to results failed!")
         return False
     else:
-        _logger.info("Push wikifier results to memcache success!")
+        _logger.info("Push wikifier results to memcache success! The result files are written in background.")
         return True
 
 def all_in_range_0_to_100(inputs):
@@ -396,7 +397,8 @@ def produce_by_automatic(input_df, target_columns=None, target_p_nodes=None, thr
     return_df_identifier = input_df.iloc[:, col_identifier]
     return_df_new = input_df.iloc[:, col_new_wikifier]
     col_res = list(set([i for i in range(len(col_name))]).difference(set(col_new_wikifier + col_identifier)))
-    return_df = copy.deepcopy(input_df.iloc[:, col_res])
+    # iloc with a list of columns already gives a new copy, no need to deep copy it again
+    return_df = input_df.iloc[:, col_res]
 
     if col_identifier:
         return_df_identifier, column_to_p_node_dict_identifier = produce_for_pandas(return_df_identifier,
@@ -414,7 +416,8 @@ def produce_by_automatic(input_df, target_columns=None, target_p_nodes=None, thr
         column_to_p_node_dict.update(column_to_p_node_dict_new_wikifier)
         col_tmp = return_df_new.columns.tolist()
         col_name.extend(list(set(col_tmp).difference(set(col_name).intersection(set(col_tmp)))))
-    return_df = pd.concat([return_df, return_df_identifier, return_df_new], axis=1)
+    # all of the parts are new frames, so concat them without copying again
+    return_df = pd.concat([return_df, return_df_identifier, return_df_new], axis=1, copy=False)
 
     return return_df[col_name], column_to_p_node_dict
 